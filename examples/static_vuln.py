@@ -26,7 +26,7 @@ import dataclasses
 import json
 import networkx  # type: ignore
 import pathlib
-from typing import Set, List, Any
+from typing import Set, List, Any, Dict, Iterator, Optional
 
 import bgraph
 from bgraph.types import NodeType, BGraph
@@ -50,20 +50,29 @@ class DataclassEncoder(json.JSONEncoder):
         return json.JSONEncoder.default(self, o)
 
 
-def get_vulnerabilities() -> List[Cve]:
-    """Returns a list of CVE."""
+def get_vulnerabilities() -> Iterator[Cve]:
+    """Yields the CVE one at a time.
+
+    If ijson is installed, the JSON file is parsed incrementally.
+    """
 
     try:
-        with open("examples/all-cve.json", "r") as file:
-            cves = json.load(file)
+        with open("examples/all-cve.json", "rb") as file:
+            try:
+                import ijson  # type: ignore
+            except ImportError:
+                cves = json.load(file)
+            else:
+                cves = ijson.items(file, "item")
+
+            for cve in cves:
+                yield Cve(**cve)
     except FileNotFoundError as e:
         print(
             "You must have a cve JSON file."
         )
         raise e
 
-    return [Cve(**cve) for cve in cves]
-
 
 def find_target_type(graph: BGraph, file_path: str) -> Set[NodeType]:
     """Find the type of targets in a BGraph
@@ -85,25 +94,31 @@ def find_target_type(graph: BGraph, file_path: str) -> Set[NodeType]:
     return set(bgraph.viewer.get_node_type(graph.nodes[targets[0]], all_types=True))
 
 
-def has_static_lib_vuln(graph: BGraph, vuln: Cve) -> bool:
+def has_static_lib_vuln(
+    graph: BGraph, vuln: Cve, target_cache: Optional[Dict[str, Set[NodeType]]] = None
+) -> bool:
     """Check if the vulnerability is a "static" one.
 
     :param graph: BGraph
     :param vuln: Vulnerability commit from Roy
+    :param target_cache: Cache of the target types of the files already seen
     :return: Boolean
     """
-    affected_types = set()
+    if target_cache is None:
+        target_cache = {}
+
     for file in vuln.files:
-        types = find_target_type(graph, file)
-        if types:
-            affected_types.update(types)
-    return "cc_library_static" in affected_types
+        if file not in target_cache:
+            target_cache[file] = find_target_type(graph, file)
 
+        # Stop at the first file belonging to a static library
+        if "cc_library_static" in target_cache[file]:
+            return True
+
+    return False
 
-def main():
-    # Get the recent vulnerabilities
-    vulnerabilities: List[Cve] = get_vulnerabilities()
 
+def main():
     # From BGraph, load a BGraph for android-11
     graph_path: pathlib.Path = next(pathlib.Path("graphs").glob("android-11*"), None)
     if graph_path is None:
@@ -111,9 +126,13 @@ def main():
 
     graph: BGraph = bgraph.viewer.load_graph(graph_path)
 
-    # Filter the list of vulnerabilities by removing the non matching one
+    # Filter the recent vulnerabilities by removing the non matching one
+    # Files are often shared between vulnerabilities so cache their target types
+    target_cache: Dict[str, Set[NodeType]] = {}
     static_vulns = [
-        vuln for vuln in vulnerabilities if has_static_lib_vuln(graph, vuln)
+        vuln
+        for vuln in get_vulnerabilities()
+        if has_static_lib_vuln(graph, vuln, target_cache)
     ]
 
     # Save the result in static-vuln.json
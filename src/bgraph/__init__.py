@@ -1,4 +1,22 @@
-import bgraph.builder
+import importlib
+
 import bgraph.exc
-import bgraph.parsers
-import bgraph.viewer
+
+from bgraph.types import Any
+
+
+_LAZY_SUBPACKAGES = ("builder", "parsers", "viewer")
+"""Subpackages imported on first access (see PEP 562)."""
+
+
+def __getattr__(name: str) -> Any:
+    """Import the heavy subpackages only when they are first used.
+
+    :param name: Name of the attribute
+    :raises AttributeError: If the attribute is not a subpackage of bgraph
+    :return: The subpackage
+    """
+    if name in _LAZY_SUBPACKAGES:
+        return importlib.import_module(f"{__name__}.{name}")
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -12,25 +12,54 @@ Prerequistes:
 
 
 import os
+import concurrent.futures
 import logging
-import multiprocessing
 import pathlib
 import tempfile
 import functools
 import fnmatch
+import re
 from pathlib import Path
 import pickle
 import shutil
+import subprocess
 
-import sh  # type: ignore
 import bgraph
+import bgraph.exc
+import bgraph.parsers
 import bgraph.utils
-from bgraph.types import List, Dict, Tuple, Optional, Union
+from bgraph.types import List, Dict, Iterable, Tuple, Optional, Union
 
 
 """Logger"""
 logger: logging.Logger = bgraph.utils.create_logger(__name__)
 
+TAGS_PREFIX: str = "refs/tags/"
+"""Prefix of the tags references in git."""
+
+TAGS_PREFIX_LENGTH: int = len(TAGS_PREFIX)
+"""Length of the tags prefix."""
+
+FILES_LIST: str = "files.txt"
+"""Name of the file storing the list of files of a project (one per line)."""
+
+MANIFEST_CACHE_DIRNAME: str = "manifests"
+"""Name of the directory (in the work dir) caching the projects of the manifests."""
+
+
+def run_command(
+    command: List[str], cwd: Optional[Path] = None
+) -> "subprocess.CompletedProcess[str]":
+    """Run a command and capture its output as text.
+
+    :param command: The command and its arguments
+    :param cwd: Optional. Working directory of the command
+    :raises FileNotFoundError: If the program is not found
+    :raises subprocess.CalledProcessError: If the command fails
+    :return: The completed process
+    """
+    return subprocess.run(command, cwd=cwd, capture_output=True, check=True, text=True)
+
 
 def get_all_branches(
     manifest: Union[Path, str], pattern: str = "android-*"
@@ -50,19 +79,19 @@ def get_all_branches(
         manifest = manifest / "platform" / "manifest.git"
 
     try:
-        tags = sh.git("ls-remote", "--tag", f"{manifest!s}", pattern)
-    except sh.ErrorReturnCode:
+        tags = run_command(["git", "ls-remote", "--tag", f"{manifest!s}", pattern])
+    except subprocess.CalledProcessError:
         raise bgraph.exc.BGraphManifestException("Unable to retrieve the branches.")
 
     branches: List[str] = []
-    for line_encoded in tags.stdout.splitlines():
+    for line in tags.stdout.splitlines():
         try:
-            _, tag = line_encoded.decode().split("\t")
+            _, tag = line.split("\t")
         except ValueError:
             continue
 
-        if tag.startswith("refs/tags/") and "^" not in tag:
-            branches.append(tag[len("refs/tags/") :])
+        if tag.startswith(TAGS_PREFIX) and "^" not in tag:
+            branches.append(tag[TAGS_PREFIX_LENGTH:])
 
     return branches
 
@@ -90,23 +119,25 @@ def create_manifest_branch(
         manifest = str(mirror / "platform" / "manifest.git")
 
     try:
-        repo = sh.Command("repo").bake("--color=never")
-    except sh.CommandNotFound:
+        run_command(
+            [
+                "repo",
+                "--color=never",
+                "init",
+                "-u",
+                f"{manifest!s}",
+                "-b",
+                branch_name,
+                "--partial-clone",
+                "--clone-filter=blob:none",
+                "--depth=1",
+            ],
+            cwd=branch_dir,
+        )
+    except FileNotFoundError:
         logger.error("Did not find repo command. Is it in PATH?")
         raise bgraph.exc.BGraphBuilderException("Repo not found.")
-
-    try:
-        repo.init(
-            "-u",
-            f"{manifest!s}",
-            "-b",
-            branch_name,
-            "--partial-clone",
-            "--clone-filter=blob:none",
-            "--depth=1",
-            _cwd=branch_dir,
-        )
-    except sh.ErrorReturnCode:
+    except subprocess.CalledProcessError:
         logger.error(
             "Unable to init the repository for branch %s. Verify that either the mirror"
             "is correct or the branch exists on the target.",
@@ -119,7 +150,7 @@ def create_manifest_branch(
 
 def partial_checkout(
     branch_name: str, project_path: Path, git_dir: Union[Path, str]
-) -> bool:
+) -> Optional[List[str]]:
     """Performs a partial checkout using git.
 
     A partial checkout allows to checkout only interesting files and not the whole repository.
@@ -128,26 +159,28 @@ def partial_checkout(
     :param branch_name: Name of the branch
     :param project_path: Path where to do the checkout
     :param git_dir: Url/Path to the git directory
-    :return: Boolean for success
+    :return: The files of the project (also stored in the files list) or None on failure
     """
 
     # Guard to not redo the operation if the checkout has already been done
     if project_path.is_dir():
-        return True
+        return load_files_list(project_path / FILES_LIST)
 
     project_path.mkdir(parents=True, exist_ok=True)
 
     # Prepare the git command
-    git = sh.git.bake(_cwd=project_path)
+    def git(*args: str) -> "subprocess.CompletedProcess[str]":
+        return run_command(["git", *args], cwd=project_path)
 
     # Init the directory only if .git folder is not present because git init fails on already inited git directories
     if not (project_path / ".git").is_dir():
-        git.init()
-        git.remote("add", "origin", f"{git_dir!s}")
+        git("init")
+        git("remote", "add", "origin", f"{git_dir!s}")
 
     # Partial fetch : without objects
     try:
-        git.fetch(
+        git(
+            "fetch",
             "--filter=blob:none",
             "--recurse-submodules=yes",
             "--no-tags",
@@ -156,54 +189,54 @@ def partial_checkout(
             "tag",
             branch_name,
         )
-    except sh.ErrorReturnCode:
+    except subprocess.CalledProcessError:
         logger.error("Unable to do the fetch part of the operation.")
-        return False
+        return None
 
     # Some versions of git will fails if the .git/info/sparse-checkout is already there
     try:
         git("sparse-checkout", "init")
-    except sh.ErrorReturnCode:
+    except subprocess.CalledProcessError:
         pass
 
     # Sparse checkout magic
     try:
         git("sparse-checkout", "set", "**/*.bp")
         git("sparse-checkout", "reapply")
-        git.checkout("--quiet", f"refs/tags/{branch_name}")
-    except sh.ErrorReturnCode:
+        git("checkout", "--quiet", f"refs/tags/{branch_name}")
+    except subprocess.CalledProcessError:
         logger.error("Unable to perform sparse-checkout magic.")
-        return False
+        return None
 
     # List all the files of the project (without downloading them)
     try:
         result = git("ls-tree", "-r", "--name-only", f"{branch_name}")
-        files = result.stdout.decode().split()
-    except sh.ErrorReturnCode:
+        files = result.stdout.splitlines()
+    except subprocess.CalledProcessError:
         files = []
 
     # We will need the list of files afterwards so store it
     try:
-        pickle.dump(files, open(project_path / "files.pickle", "wb"))
-    except pickle.PickleError:
-        logger.error("Unable to dump the list of files in the pickle-file.")
-        return False
+        with open(project_path / FILES_LIST, "w") as file:
+            file.write("\n".join(files))
+    except OSError:
+        logger.error("Unable to dump the list of files in the files list.")
+        return None
 
     # Save local space: delete git folder
     local_dir = project_path / ".git"
     if local_dir.is_dir():
         shutil.rmtree(local_dir)
 
-    return True
+    return files
 
 
-@bgraph.utils.no_except
 def project_checkout(
     branch_name: str,
     branch_dir: Path,
     mirror: Union[str, Path],
     paths: Tuple[Path, Path],
-) -> None:
+) -> bool:
     """Perform a project checkout.
 
     The project name is where a project is found in the mirror (e.g. MIRROR/platform/external/sqlite)
@@ -215,40 +248,102 @@ def project_checkout(
     :param branch_dir: Branch working directory
     :param mirror: Path/Link to a mirror
     :param paths: Project Name and project relative path
-    :return:
+    :return: Boolean, True if a soong file was checked out in the project
     """
-    project_name, relative_project_path = paths
+    # Never fail: log the exception and report the failure instead
+    try:
+        project_name, relative_project_path = paths
 
-    # Mirror git dir
-    if type(mirror) is str:
-        git_dir = f"{mirror}/{project_name}"
-    elif isinstance(mirror, pathlib.Path):
-        git_dir = str(mirror / f"{project_name}.git")
+        # Mirror git dir
+        if type(mirror) is str:
+            git_dir = f"{mirror}/{project_name}"
+        elif isinstance(mirror, pathlib.Path):
+            git_dir = str(mirror / f"{project_name}.git")
+
+        # AOSP project dir
+        project_path = branch_dir / relative_project_path
+
+        if isinstance(git_dir, Path) and not git_dir.is_dir():
+            logger.error("Project not found (%s)", git_dir)
+            return False
+
+        files = partial_checkout(branch_name, project_path, git_dir)
+        if files is None:
+            return False
+
+        return has_soong_file(files)
+    except Exception as e:
+        logger.exception(e)
+        return False
+
+
+def has_soong_file(files: List[str]) -> bool:
+    """Check if the files of a project contain a soong file.
+
+    :param files: Files of a checked out project (see `partial_checkout`)
+    :return: Boolean, True if an Android.bp file is listed
+    """
+    soong_file = bgraph.parsers.SoongParser.DEFAULT_FILENAME
+    return any(file == soong_file or file.endswith(f"/{soong_file}") for file in files)
 
-    # AOSP project dir
-    project_path = branch_dir / relative_project_path
 
-    if isinstance(git_dir, Path) and not git_dir.is_dir():
-        logger.error("Project not found (%s)", git_dir)
-        return
+def find_soong_file(branch_dir: Path) -> bool:
+    """Search for a soong file in the branch directory.
 
-    partial_checkout(branch_name, project_path, git_dir)
+    The search stops at the first soong file found.
+
+    :param branch_dir: Branch working directory
+    :return: Boolean, True if an Android.bp file was found
+    """
+    soong_file = bgraph.parsers.SoongParser.DEFAULT_FILENAME
+    try:
+        result = run_command(
+            ["find", str(branch_dir), "-name", soong_file, "-print", "-quit"]
+        )
+    except (FileNotFoundError, subprocess.CalledProcessError):
+        return next(branch_dir.rglob(soong_file), None) is not None
 
+    return bool(result.stdout)
 
-def combine_files_path(branch_dir: Path) -> Dict[Path, List[str]]:
-    """Load the "files.pickle" stored with results of git commands.
+
+def load_files_list(file_path: Path) -> Optional[List[str]]:
+    """Load a files list stored by `partial_checkout`.
+
+    :param file_path: Path to the files list
+    :return: The list of files or None if it could not be read
+    """
+    try:
+        with open(file_path, "r") as file:
+            return file.read().splitlines()
+    except OSError:
+        return None
+
+
+def combine_files_path(
+    branch_dir: Path, projects_path: Optional[Iterable[Path]] = None
+) -> Dict[Path, List[str]]:
+    """Load the files lists stored with results of git commands.
+
+    The files are read by a pool of threads since the work is mostly IO.
 
     :param branch_dir: Directory to find the AOSP partial tree
+    :param projects_path: Optional. Only load the lists of these projects (instead of
+        every list found in the tree)
     :return: A mapping of path and the list of files inside the project
     """
-    files: Dict[Path, List[str]] = {}
-    for file_path in branch_dir.rglob("files.pickle"):
-        try:
-            local_files = pickle.load(open(file_path, "rb"))
-        except pickle.PickleError:
-            continue
+    files_path: List[Path]
+    if projects_path is None:
+        files_path = list(branch_dir.rglob(FILES_LIST))
+    else:
+        files_path = [project_path / FILES_LIST for project_path in projects_path]
 
-        files[file_path.parent] = local_files
+    files: Dict[Path, List[str]] = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+        for file_path, local_files in zip(
+            files_path, executor.map(load_files_list, files_path)
+        ):
+            if local_files is not None:
+                files[file_path.parent] = local_files
 
     return files
 
@@ -262,7 +357,6 @@ def clean_disk(branch_workdir: Path) -> None:
         shutil.rmtree(branch_workdir, ignore_errors=True)
 
 
-@bgraph.utils.no_except
 def compose_manifest_branch(
     branch_name: str,
     mirror: Union[str, Path],
@@ -271,7 +365,8 @@ def compose_manifest_branch(
 ) -> Optional[Path]:
     """Create the soong parser for a manifest branch.
 
-    As the process is slow, multiprocessing.Pool is used to speed the checkout.
+    As the process is slow, a multiprocessing.Pool is used to speed the checkout (the
+    same pool is shared by every branch).
     The bottleneck is the parsing of blueprints files. However, since variables
     definition must be analyzed, we cannot just randomly parallelize this step and
     it must be done carefuly (read: it's not done yet.).
@@ -285,75 +380,94 @@ def compose_manifest_branch(
     :param force: Optional. Overwrite existing branch.
     :return: The path to the work dir
     """
-    logger.info("Start composing for %s", branch_name)
-
-    if work_dir is None:
-        work_dir = Path(tempfile.mkdtemp(prefix="bgraph_"))
-
-    # Guard: do not redo a branch
-    pickle_file = work_dir / f"{branch_name}.pickle"
-    if pickle_file.is_file() and force is False:
-        logger.info("Branch already found; skip.")
-        return work_dir
-    elif (work_dir / f"{branch_name}.empty").is_file():
-        logger.info("Branch empty; skip.")
-        return work_dir
-
-    # Create a branch by using repo
+    # Never fail: log the exception and report the failure instead
     try:
-        branch_dir = create_manifest_branch(work_dir, mirror, branch_name)
-    except bgraph.exc.BGraphBuilderException:
-        return None
-
-    manifest_file = branch_dir / ".repo" / "manifests" / "default.xml"
+        logger.info("Start composing for %s", branch_name)
 
-    logger.info("List projects")
-    project_checkout_branch = functools.partial(
-        project_checkout, branch_name, branch_dir, mirror
-    )
+        if work_dir is None:
+            work_dir = Path(tempfile.mkdtemp(prefix="bgraph_"))
 
-    # Load the manifest
-    manifest = bgraph.parsers.Manifest.from_file(manifest_file)
+        # Guard: do not redo a branch
+        pickle_file = work_dir / f"{branch_name}.pickle"
+        if pickle_file.is_file() and force is False:
+            logger.info("Branch already found; skip.")
+            return work_dir
+        elif (work_dir / f"{branch_name}.empty").is_file():
+            logger.info("Branch empty; skip.")
+            return work_dir
 
-    # Core: multiprocessing
-    with multiprocessing.Pool() as pool:
-        res = pool.map_async(project_checkout_branch, manifest.get_projects().items())
-        res.get(24 * 60 * 60)
-
-    logger.info("Finished to compose with %s", branch_name)
+        # Create a branch by using repo
+        try:
+            branch_dir = create_manifest_branch(work_dir, mirror, branch_name)
+        except bgraph.exc.BGraphBuilderException:
+            return None
 
-    # Guard: Search build files
-    for _ in branch_dir.rglob("Android.bp"):
-        break
-    else:
-        logger.info("Found 0 Android.bp file, aborting")
+        manifest_file = branch_dir / ".repo" / "manifests" / "default.xml"
 
-        # Create an empty file to prevent from doing it if we restart
-        with open(work_dir / f"{branch_name}.empty", "w") as _:
-            pass
+        logger.info("List projects")
+        project_checkout_branch = functools.partial(
+            project_checkout, branch_name, branch_dir, mirror
+        )
 
-        clean_disk(branch_dir)
-        return work_dir
+        # Load the manifest (the projects of a manifest already seen are cached)
+        projects = bgraph.parsers.Manifest.get_projects_cached(
+            manifest_file, work_dir / MANIFEST_CACHE_DIRNAME
+        )
 
-    soong_parser = bgraph.parsers.SoongParser()
+        # Core: multiprocessing
+        pool = bgraph.utils.get_pool()
+        found_soong_file: bool = False
+        for idx, has_soong in enumerate(
+            pool.imap_unordered(
+                project_checkout_branch,
+                projects.items(),
+                chunksize=bgraph.utils.get_chunksize(len(projects)),
+            )
+        ):
+            if idx % 100 == 0:
+                logger.debug("Checked out %d / %d projects", idx, len(projects))
+
+            found_soong_file = found_soong_file or has_soong
+
+        logger.info("Finished to compose with %s", branch_name)
+
+        # Guard: Search build files (only if no project reported one)
+        if not found_soong_file and not find_soong_file(branch_dir):
+            logger.info("Found 0 Android.bp file, aborting")
+
+            # Create an empty file to prevent from doing it if we restart
+            with open(work_dir / f"{branch_name}.empty", "w") as _:
+                pass
+
+            clean_disk(branch_dir)
+            return work_dir
+
+        soong_parser = bgraph.parsers.SoongParser()
+
+        logger.info("Starting parsing AOSP build files")
+        soong_parser.parse_aosp(branch_dir, project_map=projects, parallel=True)
+        # Only the projects having sections need their files listing
+        soong_parser.file_listing = combine_files_path(
+            branch_dir, soong_parser.get_projects_path()
+        )
 
-    logger.info("Starting parsing AOSP build files")
-    soong_parser.parse_aosp(branch_dir, project_map=manifest.get_projects())
-    soong_parser.file_listing = combine_files_path(branch_dir)
+        # Save the result
+        try:
+            with open(pickle_file, "wb") as file:
+                pickle.dump(soong_parser, file, protocol=pickle.HIGHEST_PROTOCOL)
+        except pickle.PickleError:
+            logger.error("Failed to pickle")
+            clean_disk(branch_dir)
+            return work_dir
 
-    # Save the result
-    try:
-        pickle.dump(soong_parser, open(pickle_file, "wb"))
-    except pickle.PickleError:
-        logger.error("Failed to pickle")
+        # Clean the disk
+        logger.info("Clean branch")
         clean_disk(branch_dir)
-        return work_dir
 
-    # Clean the disk
-    logger.info("Clean branch")
-    clean_disk(branch_dir)
-
-    return work_dir
+        return work_dir
+    except Exception as e:
+        logger.exception(e)
+        return None
 
 
 def compose_all(
@@ -378,7 +492,8 @@ def compose_all(
 
     # List branches
     all_branches = get_all_branches(mirror)
-    branches = fnmatch.filter(all_branches, branch_pattern)
+    branch_regex = re.compile(fnmatch.translate(branch_pattern))
+    branches = [branch for branch in all_branches if branch_regex.match(branch)]
 
     if work_dir is None:
         work_dir = Path(tempfile.mkdtemp(prefix="bgraph_"))
@@ -9,14 +9,32 @@ This must be used with the SoongParser developed in AOSP_BUILD project (aka acb)
 from pathlib import Path
 import pickle
 import fnmatch
-import multiprocessing
+import re
+import sys
 import functools
+import collections
+import concurrent.futures
 
 import networkx as nx  # type: ignore
 
+import bgraph.io
 import bgraph.parsers.soong_parser
 import bgraph.utils
-from bgraph.types import Iterable, Dict, List, Tuple, Literal, Optional, Section, BGraph
+from bgraph.types import (
+    Any,
+    cast,
+    Iterable,
+    Dict,
+    Final,
+    FrozenSet,
+    List,
+    Tuple,
+    Literal,
+    Optional,
+    Pattern,
+    Section,
+    BGraph,
+)
 
 
 """In Soong files, keys what indicates dependencies between targets"""
@@ -37,93 +55,167 @@ srcs_keys = [
     "export_include_dirs",
 ]
 
+"""Mapping between a soong key and the type of edge it induces"""
+edge_types: Dict[str, Literal["dep", "src"]] = {
+    **{key: "dep" for key in dependencies_keys},
+    **{key: "src" for key in srcs_keys},
+}
+
 
 logger = bgraph.utils.create_logger(__name__)
 
+"""Shortcut for the section key storing the project path."""
+SECTION_PROJECT_PATH: Final = (
+    bgraph.parsers.soong_parser.SoongParser.SECTION_PROJECT_PATH
+)
+
+"""Shortcut for the section key storing the soong file."""
+SOONG_FILE: Final = bgraph.parsers.soong_parser.SoongParser.SOONG_FILE
+
+
+def index_project_files(
+    project_path: Path, files: List[str]
+) -> Dict[Tuple[str, ...], List[str]]:
+    """Index the files of a project by every one of their ancestor directories.
+
+    For each directory of the project, the index stores the list of files found below
+    it, relative to the directory itself. Directories are keyed by their parts (see
+    `PurePath.parts`) to avoid creating a Path object for every ancestor.
+
+    :param project_path: Path for a project
+    :param files: List of files in the project (found via Git)
+    :return: A mapping between the parts of a directory and its descendent files
+    """
+    project_parts = project_path.parts
+
+    index: Dict[Tuple[str, ...], List[str]] = {}
+    for file in files:
+        parts = file.split("/")
+        ancestor = project_parts
+        for depth, part in enumerate(parts):
+            index.setdefault(ancestor, []).append("/".join(parts[depth:]))
+            ancestor += (part,)
+
+    return index
+
 
 def compute_file_list(
-    section_files: Dict[Path, List[str]],
+    section_files: Dict[Path, Tuple[List[str], FrozenSet[str]]],
+    project_index: Dict[Path, Dict[Tuple[str, ...], List[str]]],
     soong_file: Path,
     project_path: Path,
     files: List[str],
-) -> List[str]:
+) -> Tuple[List[str], FrozenSet[str]]:
     """Create the file list that matches the soong_file for the project.
 
+    The files of a project are indexed once (see `index_project_files`) so every
+    subsequent lookup for a soong file of the same project is a simple dict access.
+    The files are also stored as a set, to search the patterns without wildcard.
+
     WARNING: This function is *not* pure, it will modify in-place the section_files
-    mapping, allowing for an easy caching.
+    and project_index mappings, allowing for an easy caching.
 
     :param section_files: A mapping storing the files mapping
+    :param project_index: A mapping storing the index of each project
     :param soong_file: Path for a soong file
     :param project_path: Path for a project (should be a parent of the soong file)
     :param files: List of files in the project (found via Git)
-    :return: A list of files descendent of the soong file in the project
+    :return: A tuple (list, set) of files descendent of the soong file in the project
     """
     if soong_file not in section_files:
+        if project_path not in project_index:
+            project_index[project_path] = index_project_files(project_path, files)
 
-        section_files[soong_file] = []
-        for file in files:
-            full_path = project_path / file
-            if str(full_path).startswith(str(soong_file)):
-                try:
-                    section_files[soong_file].append(
-                        full_path.relative_to(soong_file).as_posix()
-                    )
-                except ValueError:
-                    pass
+        soong_files = project_index[project_path].get(soong_file.parts, [])
+        section_files[soong_file] = soong_files, frozenset(soong_files)
 
     return section_files[soong_file]
 
 
+@functools.lru_cache(maxsize=4096)
+def compile_pattern(pattern: str) -> Pattern[str]:
+    """Compile a shell-style pattern (as understood by fnmatch) to a regex.
+
+    :param pattern: A shell-style pattern
+    :return: The compiled regular expression
+    """
+    return re.compile(fnmatch.translate(pattern))
+
+
+def filter_files(
+    files: List[str], files_set: FrozenSet[str], pattern: str
+) -> List[str]:
+    """Filter the files matching the pattern.
+
+    This is equivalent to `fnmatch.filter` but patterns are compiled only once and
+    patterns without any wildcard are directly searched in the set of files.
+
+    :param files: List of files
+    :param files_set: The same files, as a set
+    :param pattern: A shell-style pattern
+    :return: The list of files matching the pattern
+    """
+    if not any(char in pattern for char in "*?["):
+        return [pattern] if pattern in files_set else []
+
+    return list(filter(compile_pattern(pattern).match, files))
+
+
 def convert_section(
-    graph: BGraph,
-    section_files: Dict[Path, List[str]],
+    section_files: Dict[Path, Tuple[List[str], FrozenSet[str]]],
+    project_index: Dict[Path, Dict[Tuple[str, ...], List[str]]],
     section_name: str,
     section: Section,
     project_files: List[str],
-) -> None:
-    """Convert a section from the SoongParser into a node in the graph and sets its
-    dependencies
+) -> List[Tuple[str, str, str]]:
+    """Convert a section from the SoongParser into the list of edges of its node.
 
-    Warning: This functions modifies in place the graph.
+    The graph itself is not modified here, so sections may be converted in parallel
+    and their edges added afterwards.
 
-    Note: Some refactoring should be done on the file path detection (drop fnmatch).
+    Note: Some refactoring should be done on the file path detection (drop fnmatch
+    patterns).
 
     TODO(dm):
         Integrate other type of dependencies such as exclusion
 
-    :param graph: The UDG
     :param section_files: A mapping for section files allowing an easy cache
+    :param project_index: A mapping for projects files index allowing an easy cache
     :param section_name: Name of the section to convert
     :param section: Section data in iteself
     :param project_files: Files found in the source tree
+    :return: A list of edges (origin, section_name, edge_type)
     """
+    edges: List[Tuple[str, str, str]] = []
+
     # Project Path
     try:
-        project_path: Path = section[
-            bgraph.parsers.soong_parser.SoongParser.SECTION_PROJECT_PATH
-        ]
+        project_path: Path = section[SECTION_PROJECT_PATH]
     except KeyError:
         logger.error("Missing section_project_path in %s", section_name)
-        return
+        return edges
 
     # Local Soong files
     try:
-        soong_file_path: Path = section[
-            bgraph.parsers.soong_parser.SoongParser.SOONG_FILE
-        ].parent
+        soong_file_path: Path = section[SOONG_FILE].parent
     except (KeyError, AttributeError):
         logger.error("Missing soong_file in %s", section_name)
-        return
+        return edges
+
+    # Iterate through the (nested) mappings of the section. Only the keys inducing an
+    # edge are resolved, other values are skipped without further traversal.
+    stack: List[Dict[str, Any]] = [cast(Dict[str, Any], section)]
+    while stack:
+        mapping = stack.pop()
+        for key, value in mapping.items():
+            if type(value) is dict:
+                stack.append(value)
+                continue
+
+            edge_type: Optional[Literal["dep", "src"]] = edge_types.get(key)
+            if edge_type is None:
+                continue
 
-    for key, value in bgraph.utils.recurse(section):  # type: ignore
-        edge_type: Optional[Literal["dep", "src"]] = None
-        if key in dependencies_keys:
-            edge_type = "dep"
-
-        elif key in srcs_keys:
-            edge_type = "src"
-
-        if edge_type is not None:
             for dep in value:
                 if edge_type == "src":
 
@@ -134,51 +226,91 @@ def convert_section(
                     # Since we are using fnmatch and not a proper tool, we also
                     # must take care of those prefix and remove them...
                     # TODO(dm): Use removeprefix in Python3.9
-                    for prefix in ["./", "."]:
-                        if dep.startswith(prefix):
-                            dep = dep[len(prefix) :]
-                            break
+                    if dep[:2] == "./":
+                        dep = dep[2:]
+                    elif dep[:1] == ".":
+                        dep = dep[1:]
 
                     # Resolve * in dependencies files : the pattern must be
                     # modified to accomodate Python fnmatch module
                     # FIX: https://android.googlesource.com/platform/build/soong/+/refs/heads/master#file-lists
 
-                    for dependency_file in fnmatch.filter(
-                        compute_file_list(
-                            section_files, soong_file_path, project_path, project_files
-                        ),
-                        dep.replace("**/", "*"),
+                    files, files_set = compute_file_list(
+                        section_files,
+                        project_index,
+                        soong_file_path,
+                        project_path,
+                        project_files,
+                    )
+                    for dependency_file in filter_files(
+                        files, files_set, dep.replace("**/", "*")
                     ):
-                        graph.add_edge(
-                            str(soong_file_path / dependency_file),
-                            section_name,
-                            type=edge_type,
+                        edges.append(
+                            (
+                                str(soong_file_path / dependency_file),
+                                section_name,
+                                edge_type,
+                            )
                         )
                 else:
-                    graph.add_edge(dep, section_name, type=edge_type)
+                    edges.append((dep, section_name, edge_type))
+
+    return edges
+
+
+def convert_project(
+    project_path: Path,
+    project_files: List[str],
+    sections: List[Tuple[str, Section]],
+) -> List[Tuple[str, str, str]]:
+    """Convert every section of a project into edges.
 
+    A project is the unit of work when converting in parallel because the files caches
+    are only relevant inside a project.
 
-def convert_single(result_dir: Path, pickle_file: Path) -> Tuple[str, bool]:
+    :param project_path: Path for the project
+    :param project_files: Files found in the project
+    :param sections: List of (section_name, section) of the project
+    :return: A list of edges (origin, section_name, edge_type)
+    """
+    section_files: Dict[Path, Tuple[List[str], FrozenSet[str]]] = {}
+    project_index: Dict[Path, Dict[Tuple[str, ...], List[str]]] = {}
+
+    edges: List[Tuple[str, str, str]] = []
+    for section_name, section in sections:
+        edges.extend(
+            convert_section(
+                section_files, project_index, section_name, section, project_files
+            )
+        )
+
+    return edges
+
+
+def convert_single(
+    result_dir: Path, pickle_file: Path, parallel: bool = False
+) -> Tuple[str, bool]:
     """Convert a pickle file representing a soong parser to a graph and store it in
     result dir.
 
     :param result_dir: Where to store the result
     :param pickle_file: Which file to convert
+    :param parallel: Optional. Convert the projects of the branch in parallel
     :return: A tuple (branch_name, boolean for sucess) for later statistics.
     """
     branch_name: str = pickle_file.stem
     bgraph_file = result_dir / (pickle_file.with_suffix(".bgraph").name)
 
     try:
-        soong_parser = pickle.load(open(pickle_file, "rb"))
+        with open(pickle_file, "rb") as file:
+            soong_parser = pickle.load(file)
     except pickle.PickleError:
         return branch_name, False
 
-    graph = build_source_map(soong_parser)
+    graph = build_source_map(soong_parser, parallel=parallel)
 
     try:
-        with open(bgraph_file, "wb") as file:
-            pickle.dump(graph, file)
+        bgraph.io.save_graph(graph, bgraph_file)
     except pickle.PickleError:
         return branch_name, False
 
@@ -200,9 +332,20 @@ def convert(pickle_dir: Path, result_dir: Path) -> None:
     ]
     partial_convert_single = functools.partial(convert_single, result_dir)
 
-    with multiprocessing.Pool() as pool:
-        res = pool.map_async(partial_convert_single, to_convert)
-        results = res.get()
+    results: List[Tuple[str, bool]]
+    if len(to_convert) == 1:
+        # With a single branch, parallelize the conversion of the branch itself
+        results = [partial_convert_single(to_convert[0], parallel=True)]
+    else:
+        results = []
+        pool = bgraph.utils.get_pool()
+        for branch_result in pool.imap_unordered(
+            partial_convert_single,
+            to_convert,
+            chunksize=bgraph.utils.get_chunksize(len(to_convert)),
+        ):
+            results.append(branch_result)
+            logger.info("Converted %d / %d branches", len(results), len(to_convert))
 
     count_success = 0
     for branch_name, result in results:
@@ -214,7 +357,9 @@ def convert(pickle_dir: Path, result_dir: Path) -> None:
     logger.info("Converted %d/%d branches", count_success, len(results))
 
 
-def build_source_map(sp: bgraph.parsers.soong_parser.SoongParser) -> BGraph:
+def build_source_map(
+    sp: bgraph.parsers.soong_parser.SoongParser, parallel: bool = False
+) -> BGraph:
     """
     From a SoongParser object, converts all the targets into a graph representation where
     the links between two nodes are :
@@ -223,32 +368,64 @@ def build_source_map(sp: bgraph.parsers.soong_parser.SoongParser) -> BGraph:
 
     The graphs are saved as networkx objects with pickle.
 
+    Note: the parallel conversion spawns processes so it must not be used from a
+    daemonic process (e.g. inside a multiprocessing.Pool).
+
     :param: sp: The soong parser
+    :param parallel: Optional. Convert the projects in parallel
     :return: An UDG as a DiGraph
     """
     graph: BGraph = nx.DiGraph()
 
-    for target in sp.sections:
-        graph.add_node(target, data=sp.get_section(target))
+    sections_data: Dict[str, List[Section]] = {
+        target: sp.get_section(target) for target in sp.sections
+    }
+    for target, data in sections_data.items():
+        graph.add_node(sys.intern(target), data=data)
 
     file_listing = sp.file_listing
 
-    section_files: Dict[Path, List[str]] = {}
-
-    nodes = list(graph.nodes)
-    for idx, section_name in enumerate(nodes):
-        if idx % 500 == 0:
-            logger.debug("Converting section %d / %d", idx, len(nodes))
-
-        for section in graph.nodes[section_name]["data"]:
-
-            project_path: Path = section.get(
-                bgraph.parsers.soong_parser.SoongParser.SECTION_PROJECT_PATH
-            )
-            project_files: List[str] = sp.file_listing.get(project_path, [])
-            if not project_files:
+    # Group the sections by project
+    projects: Dict[Path, List[Tuple[str, Section]]] = collections.defaultdict(list)
+    for section_name, sections in sections_data.items():
+        for section in sections:
+            project_path = cast(Path, section.get(SECTION_PROJECT_PATH))
+            if not file_listing.get(project_path):
                 logger.info(f"Cannot find files for project {section_name}")
 
-            convert_section(graph, section_files, section_name, section, project_files)
+            projects[project_path].append((section_name, section))
+
+    projects_path = list(projects)
+    projects_files = [file_listing.get(path, []) for path in projects_path]
+    projects_sections = [projects[path] for path in projects_path]
+
+    logger.debug(
+        "Converting %d sections in %d projects", len(sections_data), len(projects)
+    )
+
+    results: Iterable[List[Tuple[str, str, str]]]
+    if parallel:
+        with concurrent.futures.ProcessPoolExecutor() as executor:
+            chunksize = bgraph.utils.get_chunksize(len(projects_path))
+            results = list(
+                executor.map(
+                    convert_project,
+                    projects_path,
+                    projects_files,
+                    projects_sections,
+                    chunksize=chunksize,
+                )
+            )
+    else:
+        results = map(convert_project, projects_path, projects_files, projects_sections)
+
+    # Insert every edge at once. The same names appear in many edges (and come back as
+    # distinct objects from the workers) so intern them to share a single copy.
+    intern = sys.intern
+    graph.add_edges_from(
+        (intern(origin), intern(section_name), {"type": intern(edge_type)})
+        for edges in results
+        for origin, section_name, edge_type in edges
+    )
 
     return graph
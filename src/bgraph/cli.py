@@ -0,0 +1,388 @@
+"""
+Command line entry point of BGraph.
+
+The read-only commands (list and query) are the ones called repeatedly, so they are
+parsed here with argparse and run without importing typer. Every other invocation
+(help, completion, generate commands, invalid arguments) is handed to the typer
+application defined in `bgraph.main`.
+"""
+
+import argparse
+import functools
+import json
+import logging
+import os
+import pathlib
+import sys
+
+import bgraph.exc
+from bgraph.types import (
+    BGraph,
+    Dict,
+    Iterator,
+    List,
+    NoReturn,
+    Optional,
+    OutChoice,
+    QueryType,
+    Tuple,
+    TYPE_CHECKING,
+)
+
+if TYPE_CHECKING:
+    import rich.console
+
+
+FAST_COMMANDS: List[str] = ["list", "query"]
+"""Commands handled without typer."""
+
+HELP_FLAGS: List[str] = ["--help", "-h", "--install-completion", "--show-completion"]
+"""Flags that must be handled by typer."""
+
+INDEX_DIRNAME: str = "bgraph"
+"""Directory of the indexes storing the results of list, in the user cache directory."""
+
+_QUERY_DISPATCH: Tuple[Tuple[str, QueryType, str, bool], ...] = (
+    ("target", QueryType.TARGET, "find_sources", False),
+    ("src", QueryType.SOURCE, "find_target", True),
+    ("dependency", QueryType.DEPENDENCY, "find_dependency", False),
+)
+"""Query options as (option, query type, viewer function, returns the value matched)"""
+
+_QUERY_GRAPH: Dict[Tuple[str, int], BGraph] = {}
+"""Graph queried last, by (path, modification time) (see `load_query_graph`)."""
+
+
+class FallbackException(Exception):
+    """Raised when the fast path cannot handle the command line."""
+
+    pass
+
+
+class FastArgumentParser(argparse.ArgumentParser):
+    """Argument parser failing with an exception instead of exiting.
+
+    The error message is then left to typer.
+    """
+
+    def error(self, message: str) -> NoReturn:
+        raise FallbackException(message)
+
+
+def fail(message: str, code: int) -> NoReturn:
+    """Print a message and exit.
+
+    :param message: Message to print
+    :param code: Exit code
+    """
+    print(message)
+    sys.exit(code)
+
+
+@functools.lru_cache(maxsize=1)
+def _console() -> "rich.console.Console":
+    """Create the console used to display the results, once.
+
+    :return: A rich console
+    """
+    import rich.console
+
+    return rich.console.Console()
+
+
+def set_logging_level(verbose: bool = False) -> None:
+    """Set the level of the root logger before running a command.
+
+    The loggers of BGraph have their own handlers (see `bgraph.utils.create_logger`)
+    so only the level is set.
+
+    :param verbose: Optional. Log debug messages
+    """
+    logging.getLogger().setLevel(logging.DEBUG if verbose else logging.INFO)
+
+
+def walk_files(
+    directory: pathlib.Path,
+    suffix: str,
+    directories_mtime: Optional[Dict[str, int]] = None,
+) -> Iterator[Tuple[str, int]]:
+    """Recursively search the files ending with suffix in the directory.
+
+    :param directory: Root of the search
+    :param suffix: Suffix of the files to find
+    :param directories_mtime: Optional. If set, is filled with the modification time
+        of every directory walked
+    :return: An iterator of (name, size) of the files found
+    """
+    directories: List[str] = [str(directory)]
+    while directories:
+        current_directory = directories.pop()
+        if directories_mtime is not None:
+            directories_mtime[current_directory] = os.stat(
+                current_directory
+            ).st_mtime_ns
+
+        with os.scandir(current_directory) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    directories.append(entry.path)
+                elif entry.is_file(follow_symlinks=False) and entry.name.endswith(
+                    suffix
+                ):
+                    yield entry.name, entry.stat().st_size
+
+
+def get_index_path(directory: pathlib.Path) -> pathlib.Path:
+    """Get the path of the index of a directory.
+
+    The indexes are stored in the user cache directory ($XDG_CACHE_HOME, by default
+    ~/.cache) under the hash of the directory path, so the listed directory is never
+    written.
+
+    :param directory: The directory listed
+    :return: Path of the index file
+    """
+    # Only the list command needs hashlib: do not pay for its import in the others.
+    import hashlib
+
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    digest = hashlib.sha256(str(directory.resolve()).encode()).hexdigest()
+    return pathlib.Path(cache_home) / INDEX_DIRNAME / f"{digest}.json"
+
+
+def load_index(
+    directory: pathlib.Path, extension: str
+) -> Optional[List[Tuple[str, int]]]:
+    """Load the files found by a previous listing of the directory.
+
+    The index is only valid if no directory walked was modified since (a directory
+    modification time changes when an entry is added, removed or renamed). Checking it
+    costs one stat per directory, and no stat of the files: a file rewritten in place
+    does not modify its directory, so its size is the one of the last walk.
+
+    :param directory: The directory listed
+    :param extension: Extension of the files listed
+    :return: The list of (name, size) or None if there is no valid index
+    """
+    try:
+        with open(get_index_path(directory), "r") as file:
+            index = json.load(file)
+
+        if index["extension"] != extension:
+            return None
+
+        for directory_path, mtime in index["directories"].items():
+            if os.stat(directory_path).st_mtime_ns != mtime:
+                return None
+
+        return [(name, size) for name, size in index["entries"]]
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def list_files(directory: pathlib.Path, extension: str) -> Iterator[Tuple[str, int]]:
+    """List the files with the extension in the directory, using the index if valid.
+
+    When the directory has to be walked, the index is updated (if it is writable).
+
+    :param directory: The directory to list
+    :param extension: Extension of the files to list
+    :return: An iterator of (name, size) of the files found
+    """
+    entries = load_index(directory, extension)
+    if entries is not None:
+        yield from entries
+        return
+
+    directories_mtime: Dict[str, int] = {}
+    entries = []
+    for entry in walk_files(directory, extension, directories_mtime):
+        entries.append(entry)
+        yield entry
+
+    index_path = get_index_path(directory)
+    try:
+        index_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(index_path, "w") as file:
+            json.dump(
+                {
+                    "extension": extension,
+                    "directories": directories_mtime,
+                    "entries": entries,
+                },
+                file,
+            )
+    except OSError:
+        pass
+
+
+def list_command(directory: pathlib.Path, extension: Optional[str]) -> None:
+    """List the BGraph already generated.
+
+    :param directory: The directory to search BGraph files
+    :param extension: Extension of the BGraph files
+    """
+    # Only this command needs rich: do not pay for its import in the others.
+    import rich.table
+    import rich.filesize
+    import rich.live
+
+    table = rich.table.Table(title="BGraph founds :")
+    table.add_column("Name", justify="right")
+    table.add_column("Size", justify="right")
+
+    # Display the rows as soon as they are found
+    with rich.live.Live(table, console=_console(), refresh_per_second=10):
+        for name, size in list_files(directory, extension or ""):
+            table.add_row(name, rich.filesize.decimal(size))
+
+
+def load_query_graph(graph_path: pathlib.Path) -> BGraph:
+    """Load the graph to query, reusing the graph of the previous query if possible.
+
+    The graph is reused as long as the file is not modified, so repeated queries on the
+    same graph (e.g. from a script) only load it once and share the results computed
+    by the viewer. The graph is only used by `query` and never returned to a caller,
+    so it cannot be modified.
+
+    :param graph_path: BGraph to query
+    :raises BGraphLoadingException: If the graph cannot be loaded
+    :return: The graph
+    """
+    from bgraph import viewer
+
+    try:
+        key = (str(graph_path.resolve()), graph_path.stat().st_mtime_ns)
+    except OSError:
+        raise bgraph.exc.BGraphLoadingException("Unable to load the graph.")
+
+    graph = _QUERY_GRAPH.get(key)
+    if graph is None:
+        # Only keep one graph alive
+        _QUERY_GRAPH.clear()
+        graph = _QUERY_GRAPH[key] = viewer.load_graph(graph_path)
+
+    return graph
+
+
+def query(
+    graph_path: pathlib.Path,
+    target: Optional[str],
+    src: Optional[str],
+    dependency: Optional[str],
+    out: OutChoice,
+) -> None:
+    """Query a BGraph.
+
+    :param graph_path: BGraph to query
+    :param target: Target to query
+    :param src: Source file
+    :param dependency: Dependency
+    :param out: Output format
+    """
+    from bgraph import viewer
+
+    if (target is not None) + (src is not None) + (dependency is not None) > 1:
+        fail("Define only one of src/target/dependency", code=1)
+
+    values: Dict[str, Optional[str]] = {
+        "target": target,
+        "src": src,
+        "dependency": dependency,
+    }
+
+    for option, query_type, function_name, returns_value in _QUERY_DISPATCH:
+        query_value = values[option]
+        if query_value is not None:
+            break
+    else:
+        fail("Define one of src/target/dependency", code=1)
+
+    try:
+        graph = load_query_graph(graph_path)
+    except bgraph.exc.BGraphLoadingException:
+        fail("Unable to load the graph", code=1)
+
+    result: List[str]
+    if returns_value:
+        query_value, result = getattr(viewer, function_name)(graph, query_value)
+    else:
+        result = getattr(viewer, function_name)(graph, query_value)
+
+    if not result:
+        fail("No result for request", code=2)
+
+    viewer.format_result(graph, result, query_type, query_value, out)
+
+
+def create_parser() -> FastArgumentParser:
+    """Create the parser for the fast commands.
+
+    It mirrors the typer definitions of `bgraph.main`. Like typer, abbreviated options
+    (e.g. --tar for --target) are rejected.
+
+    :return: An argument parser
+    """
+    parser = FastArgumentParser(prog="bgraph", add_help=False, allow_abbrev=False)
+    commands = parser.add_subparsers(dest="command")
+
+    list_parser = commands.add_parser("list", add_help=False, allow_abbrev=False)
+    list_parser.add_argument("directory", type=pathlib.Path)
+    list_parser.add_argument("--extension", default=".bgraph")
+
+    query_parser = commands.add_parser("query", add_help=False, allow_abbrev=False)
+    query_parser.add_argument("graph_path", type=pathlib.Path)
+    query_parser.add_argument("--target", default=None)
+    query_parser.add_argument("--src", default=None)
+    query_parser.add_argument("--dep", dest="dependency", default=None)
+    query_parser.add_argument(
+        "--out", type=OutChoice, choices=list(OutChoice), default=OutChoice.TXT
+    )
+
+    return parser
+
+
+def run_fast(argv: List[str]) -> None:
+    """Run a fast command.
+
+    :param argv: Command line arguments (without the program name)
+    :raises FallbackException: If the command must be handled by typer
+    """
+    args = create_parser().parse_args(argv)
+
+    set_logging_level()
+
+    if args.command == "list":
+        directory = args.directory.resolve()
+        if not directory.is_dir():
+            raise FallbackException("Invalid directory")
+
+        list_command(directory, args.extension)
+
+    elif args.command == "query":
+        graph_path = args.graph_path.resolve()
+        if not graph_path.is_file():
+            raise FallbackException("Invalid graph path")
+
+        query(graph_path, args.target, args.src, args.dependency, args.out)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Main entry point.
+
+    :param argv: Optional. Command line arguments (default to sys.argv)
+    """
+    if argv is None:
+        argv = sys.argv[1:]
+
+    if argv and argv[0] in FAST_COMMANDS and not set(HELP_FLAGS) & set(argv):
+        try:
+            return run_fast(argv)
+        except FallbackException:
+            pass
+
+    from bgraph.main import app
+
+    app(args=argv, prog_name="bgraph")
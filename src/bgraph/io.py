@@ -0,0 +1,39 @@
+import pickle
+import pathlib
+
+import bgraph.exc
+from bgraph.types import Union, BGraph
+
+
+BUFFER_SIZE: int = 1 << 20
+"""Size of the buffer used to read and write the graph files."""
+
+
+def load_graph(graph_path: Union[str, pathlib.Path]) -> BGraph:
+    """Load a B-Graph and return the DiGraph associated.
+
+    Every call loads the file again and returns a new graph: callers querying the same
+    graph several times should keep the returned graph instead of loading it again.
+
+    :param graph: Path to the graph file (stored with pickle)
+    :return: A DiGraph
+    """
+    try:
+        # Large reads: the unpickler asks for many small ones
+        with open(graph_path, "rb", buffering=BUFFER_SIZE) as file:
+            graph: BGraph = pickle.load(file)
+    except (pickle.PickleError, EOFError, FileNotFoundError):
+        raise bgraph.exc.BGraphLoadingException("Unable to load the graph.")
+
+    return graph
+
+
+def save_graph(graph: BGraph, graph_path: Union[str, pathlib.Path]) -> None:
+    """Save a B-Graph in a file loadable with `load_graph`.
+
+    :param graph: The DiGraph to save
+    :param graph_path: Path to the graph file
+    :raises pickle.PickleError: If the graph cannot be pickled
+    """
+    with open(graph_path, "wb", buffering=BUFFER_SIZE) as file:
+        pickle.dump(graph, file, protocol=pickle.HIGHEST_PROTOCOL)
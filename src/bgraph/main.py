@@ -1,17 +1,14 @@
-import logging
-import pathlib
+from __future__ import annotations
+
+import os
 from pathlib import Path
-import enum
 import typer
 
-import rich.table
-import rich.console
-import rich.filesize
-
 import bgraph
+import bgraph.cli
 import bgraph.exc
 import bgraph.utils
-from bgraph.types import Optional, QueryType, OutChoice, List, Union
+from bgraph.types import Optional, OutChoice
 
 
 app = typer.Typer()
@@ -43,16 +40,18 @@ def generate_single(
     It will work in the workdir and store results in result_dir.
     """
 
+    from bgraph import builder
+
     # Assume the mirror is a Path if "http" is not found in mirror.
-    mirror_path: Union[str, pathlib.Path] = bgraph.utils.clean_mirror_path(mirror)
+    mirror_path: str | Path = bgraph.utils.clean_mirror_path(mirror)
 
-    workdir = bgraph.builder.compose_manifest_branch(branch_name, mirror_path, workdir)
+    workdir = builder.compose_manifest_branch(branch_name, mirror_path, workdir)
 
     if workdir is None:
         typer.echo("Compose manifest failed.", err=True)
         raise typer.Exit(code=1)
 
-    bgraph.builder.convert(workdir, result_dir)
+    builder.convert(workdir, result_dir)
 
 
 @app.command()
@@ -76,13 +75,17 @@ def generate(
     ),
 ):
     """Generate BGraph's from a mirror dir."""
+    from bgraph import builder
 
-    mirror_path: Union[str, pathlib.Path] = bgraph.utils.clean_mirror_path(mirror)
+    mirror_path: str | Path = bgraph.utils.clean_mirror_path(mirror)
 
-    workdir = bgraph.builder.compose_all(mirror_path, branch_pattern, workdir)
+    workdir = builder.compose_all(mirror_path, branch_pattern, workdir)
 
-    bgraph.builder.convert(workdir, result_dir)
-    founds = len(list(result_dir.glob("*.bgraph")))
+    builder.convert(workdir, result_dir)
+    with os.scandir(result_dir) as entries:
+        founds = sum(
+            1 for entry in entries if entry.name.endswith(".bgraph") and entry.is_file()
+        )
     typer.echo(f"Generated {founds} graphs.")
 
 
@@ -104,19 +107,7 @@ def list_command(
     """
     List the BGraph already generated.
     """
-
-    table = rich.table.Table(title="BGraph founds :")
-    table.add_column("Name", justify="right")
-    table.add_column("Size", justify="right")
-
-    for bgraph_file in directory.rglob(f"*{extension}"):
-
-        table.add_row(
-            bgraph_file.name, rich.filesize.decimal(bgraph_file.stat().st_size)
-        )
-
-    console = rich.console.Console()
-    console.print(table)
+    bgraph.cli.list_command(directory, extension)
 
 
 @app.command()
@@ -136,44 +127,15 @@ def query(
     out: OutChoice = typer.Option(OutChoice.TXT, help="Output format"),
 ):
     """Query a BGraph."""
-
-    defined = [target is not None, src is not None, dependency is not None]
-    if defined.count(True) > 1:
-        typer.echo("Define only one of src/target/dependency")
-        raise typer.Exit(code=1)
-
-    try:
-        graph = bgraph.viewer.load_graph(graph_path)
-    except bgraph.exc.BGraphLoadingException:
-        typer.echo("Unable to load the graph")
-        raise typer.Exit(code=1)
-
-    result: List[str]
-    query_type: QueryType
-    if target is not None:
-        result = bgraph.viewer.find_sources(graph, target)
-        query_type = QueryType.TARGET
-        query_value = target
-    elif src is not None:
-        query_value, result = bgraph.viewer.find_target(graph, src)
-        query_type = QueryType.SOURCE
-    else:
-        query_type = QueryType.DEPENDENCY
-        result = bgraph.viewer.find_dependency(graph, dependency)
-        query_value = dependency
-
-    if not result:
-        typer.echo("No result for request")
-        raise typer.Exit(code=2)
-
-    bgraph.viewer.format_result(graph, result, query_type, query_value, out)
+    bgraph.cli.query(graph_path, target, src, dependency, out)
 
 
 @app.callback()
 def main(
+    ctx: typer.Context,
     verbose: bool = typer.Option(
         False, "--verbose", "-v", help="Activate verbose output"
-    )
+    ),
 ):
     """BGraph - generate and query build dependency graphes.
 
@@ -186,8 +148,8 @@ def main(
 
     To get more help, see the online documentation.
     """
-    logging_level = logging.INFO
-    if verbose:
-        logging_level = logging.DEBUG
+    # Nothing will be logged during completion or without a command
+    if ctx.resilient_parsing or ctx.invoked_subcommand is None:
+        return
 
-    logging.getLogger().setLevel(logging_level)
+    bgraph.cli.set_logging_level(verbose)
@@ -1,31 +1,37 @@
 import collections
+import concurrent.futures
 import base64
-import copy
-import enum
+import binascii
+import functools
+import hashlib
+import itertools
 import logging
 import os
 import pathlib
-import xml.sax
+import pickle
+import re
+import threading
+import xml.etree.ElementTree
 import pyparsing  # type: ignore
 
-# Improve performance by caching
-pyparsing.ParserElement.enablePackrat()
-
-import untangle  # type: ignore
-
 import bgraph.exc
 import bgraph.utils
 from bgraph.types import (
     Any,
+    Callable,
     cast,
     Dict,
     Final,
+    FrozenSet,
+    Iterable,
+    Iterator,
     List,
     Literal,
     Optional,
     overload,
     Section,
-    TypedDict,
+    Set,
+    Tuple,
     Union,
 )
 
@@ -33,6 +39,74 @@ from bgraph.types import (
 logger: logging.Logger = bgraph.utils.create_logger(__name__)
 """Logger."""
 
+IGNORED_DIRECTORIES: Final = frozenset({".git", ".repo"})
+"""Directories never containing soong files, skipped when walking AOSP."""
+
+IDENTIFIER_PATTERN: Final = r"(?!(?:true|false)\b)[A-Za-z_][A-Za-z0-9_]*"
+"""Identifiers (and variables) of the blueprint syntax, except the booleans."""
+
+QUOTED_STRING_PATTERN: Final = r'"(?:[^"\\]|\\.)*"'
+"""Double quoted string (with backslash escapes) of the blueprint syntax."""
+
+QUOTED_STRING: Final = re.compile(QUOTED_STRING_PATTERN, re.DOTALL)
+"""Compiled version of QUOTED_STRING_PATTERN."""
+
+STRING_LIST_PATTERN: Final = (
+    r"\[[ \t\r\n]*(?:{0}[ \t\r\n]*(?:,[ \t\r\n]*{0}[ \t\r\n]*)*,?[ \t\r\n]*)?\]".format(
+        QUOTED_STRING_PATTERN
+    )
+)
+"""List made only of quoted strings (without comments inside)."""
+
+ESCAPED_CHARACTER: Final = re.compile(r"\\(.)")
+"""Character escaped by a backslash in a quoted string."""
+
+BASE64_IGNORED: Final = re.compile(rb"[^A-Za-z0-9+/=]")
+"""Characters discarded before decoding base64 data."""
+
+
+def _merge_value(mapping: Dict[str, Any], local_key: str, local_val: Any) -> None:
+    """Merge a value in a mapping, see `SoongParser._merge_section`.
+
+    :param mapping: Mapping to update
+    :param local_key: Key of the value
+    :param local_val: Value to merge
+    """
+    if local_key not in mapping:
+        mapping[local_key] = local_val
+    else:
+        # For other types (like Paths), overwrite
+        _MERGE_HANDLERS.get(type(local_val), _overwrite_value)(
+            mapping, local_key, local_val
+        )
+
+
+def _overwrite_value(mapping: Dict[str, Any], local_key: str, local_val: Any) -> None:
+    """Overwrite the value (e.g. boolean or string)."""
+    mapping[local_key] = local_val
+
+
+def _merge_list(mapping: Dict[str, Any], local_key: str, local_val: List) -> None:
+    """Prepend the list to the existing value."""
+    mapping[local_key] = local_val + list(mapping[local_key])
+
+
+def _merge_dict(mapping: Dict[str, Any], local_key: str, local_val: Dict) -> None:
+    """Merge every nested value of the dict."""
+    nested_mapping = mapping[local_key]
+    for nested_key, nested_val in local_val.items():
+        _merge_value(nested_mapping, nested_key, nested_val)
+
+
+_MERGE_HANDLERS: Dict[type, Callable[[Dict[str, Any], str, Any], None]] = {
+    str: _overwrite_value,
+    bool: _overwrite_value,
+    int: _overwrite_value,
+    list: _merge_list,
+    dict: _merge_dict,
+}
+"""Merge function according to the type of the value merged."""
+
 
 class Manifest:
     """
@@ -45,21 +119,67 @@ class Manifest:
     This classes is a light wrapper around the XML File to query the parts of the
     manifest we are interested into.
 
-    :param manifest_content: The content of a manifest
+    :param manifest_content: The content of a manifest (or the path of the file, or
+        an iterable of chunks of the content as bytes)
     """
 
-    def __init__(self, manifest_content: str) -> None:
+    READ_SIZE: Final = 64 * 1024
+    """Size of the chunks read from the manifest file or the network."""
+
+    def __init__(self, manifest_content: Union[str, Iterable[bytes]]) -> None:
         """Constructor method"""
+        chunks: Iterable[Union[str, bytes]]
+        if not isinstance(manifest_content, str):
+            chunks = manifest_content
+        elif os.path.exists(manifest_content):
+            chunks = self._read_file(manifest_content)
+        else:
+            chunks = [manifest_content]
+
+        # Only the (name, path) of the projects are needed: stream the file instead of
+        # building the whole tree.
+        self.projects: List[Tuple[Optional[str], Optional[str]]] = []
+        root: Optional[xml.etree.ElementTree.Element] = None
+        depth: int = 0
+
+        parser: "xml.etree.ElementTree.XMLPullParser[xml.etree.ElementTree.Element]"
+        parser = xml.etree.ElementTree.XMLPullParser(events=("start", "end"))
+
+        def read_events() -> None:
+            nonlocal root, depth
+            # Only start and end events are read: they always hold an element
+            events = cast(
+                Iterator[Tuple[str, xml.etree.ElementTree.Element]],
+                parser.read_events(),
+            )
+            for event, element in events:
+                if event == "start":
+                    depth += 1
+                    if root is None:
+                        root = element
+                    continue
+
+                depth -= 1
+                if depth == 1:
+                    if element.tag == "project":
+                        self.projects.append((element.get("name"), element.get("path")))
+
+                    # Free the children of the manifest already read
+                    if root is not None:
+                        root.clear()
+
         try:
-            self.xml: untangle.Element = untangle.parse(manifest_content)
-        except xml.sax.SAXParseException as e:
+            for chunk in chunks:
+                parser.feed(chunk)
+                read_events()
+
+            parser.close()
+            read_events()
+        except xml.etree.ElementTree.ParseError as e:
             logger.exception(e)
             raise bgraph.exc.BGraphManifestException("Unable to load the manifest")
 
-        if (
-            getattr(self.xml, "manifest", False) is False
-            or getattr(self.xml.manifest, "project", False) is False
-        ):
+        if root is None or root.tag != "manifest" or not self.projects:
             raise bgraph.exc.BGraphManifestException("Manifest misformed")
 
     def get_projects(self) -> Dict[str, str]:
@@ -68,10 +188,7 @@ class Manifest:
         :return: A mapping between project name and project paths
         """
         project_map: Dict[str, str] = {}
-        for project in self.xml.manifest.project:
-            project_name = project["name"]
-            project_path = project["path"]
-
+        for project_name, project_path in self.projects:
             if project_name is not None and project_path is not None:
                 project_map[project_name] = project_path
             else:
@@ -81,6 +198,47 @@ class Manifest:
 
         return project_map
 
+    @classmethod
+    def get_projects_cached(
+        cls, file_path: Union[str, pathlib.Path], cache_dir: pathlib.Path
+    ) -> Dict[str, str]:
+        """Returns the list of the projects for a manifest file, using a cache.
+
+        The mapping is pickled in the cache directory, under the hash of the manifest
+        content: the XML is only parsed the first time a manifest is seen.
+
+        :param file_path: Path of the manifest file
+        :param cache_dir: Directory of the cache (created if needed)
+        :raises BGraphManifestException: If the manifest is not found
+        :return: A mapping between project name and project paths
+        """
+        file_path = pathlib.Path(file_path)
+        if not file_path.is_file():
+            raise bgraph.exc.BGraphManifestException()
+
+        digest = hashlib.blake2b(digest_size=16)
+        for chunk in cls._read_file(file_path.as_posix()):
+            digest.update(chunk)
+
+        cache_path = cache_dir / f"{digest.hexdigest()}.pkl"
+        try:
+            with open(cache_path, "rb") as file:
+                return pickle.load(file)
+        except FileNotFoundError:
+            pass
+        except (OSError, pickle.UnpicklingError, EOFError):
+            logger.warning("Unable to load the cached manifest %s", cache_path)
+
+        project_map = cls.from_file(file_path).get_projects()
+        try:
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            with open(cache_path, "wb") as file:
+                pickle.dump(project_map, file, protocol=pickle.HIGHEST_PROTOCOL)
+        except OSError:
+            logger.warning("Unable to cache the manifest in %s", cache_path)
+
+        return project_map
+
     @classmethod
     def from_url(
         cls, manifest_name: str, other_url: Optional[str] = None
@@ -108,20 +266,47 @@ class Manifest:
         else:
             url_content = other_url
 
-        try:
-            response = requests.get(url_content)
-        except requests.exceptions.RequestException as e:
-            raise bgraph.exc.BGraphManifestException(e)
+        def download() -> Iterator[bytes]:
+            try:
+                with requests.get(url_content, stream=True) as response:
+                    yield from response.iter_content(chunk_size=cls.READ_SIZE)
+            except requests.exceptions.RequestException as e:
+                raise bgraph.exc.BGraphManifestException(e)
+
+        # The XML is parsed while it is downloaded and decoded
+        return cls(manifest_content=cls._decode_base64(download()))
+
+    @classmethod
+    def _read_file(cls, file_path: str) -> Iterator[bytes]:
+        """Read a file by chunks.
+
+        :param file_path: Path of the file
+        :return: An iterator of chunks
+        """
+        with open(file_path, "rb") as file:
+            yield from iter(functools.partial(file.read, cls.READ_SIZE), b"")
 
+    @staticmethod
+    def _decode_base64(chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """Decode base64 encoded data by chunks.
+
+        :param chunks: Chunks of encoded data
+        :raises BGraphManifestException: If the data is not valid base64
+        :return: An iterator of chunks of decoded data
+        """
+        pending: bytes = b""
         try:
-            xml_string: str = base64.decodebytes(response.content).decode(
-                response.encoding
-            )
-        except TypeError as e:
+            for chunk in chunks:
+                # Characters outside of the alphabet (e.g. new lines) are ignored
+                pending += BASE64_IGNORED.sub(b"", chunk)
+                length = len(pending) - len(pending) % 4
+                yield base64.b64decode(pending[:length])
+                pending = pending[length:]
+
+            yield base64.b64decode(pending)
+        except binascii.Error as e:
             raise bgraph.exc.BGraphManifestException(e)
 
-        return cls(manifest_content=xml_string)
-
     @classmethod
     def from_file(cls, file_path: Union[str, pathlib.Path]) -> "Manifest":
         """Load a Manifest from a file
@@ -161,12 +346,19 @@ class SoongParser:
     DEFAULT_FILENAME: Final = "Android.bp"
     """Default name for Soong file."""
 
-    NATIVE_TYPES: List[str] = [
-        "cc_binary",
-        "cc_library",
-        "cc_library_shared",
-        "cc_library_static",
-    ]
+    LIBRARY_TYPES: FrozenSet[str] = frozenset(
+        {
+            "cc_library",
+            "cc_library_shared",
+            "cc_library_static",
+        }
+    )
+    """Type of section considered as native libraries."""
+
+    BINARY_TYPES: FrozenSet[str] = frozenset({"cc_binary"})
+    """Type of section considered as native binaries."""
+
+    NATIVE_TYPES: FrozenSet[str] = LIBRARY_TYPES | BINARY_TYPES
     """Type of section considered as "natives"."""
 
     def __init__(self) -> None:
@@ -174,8 +366,31 @@ class SoongParser:
         self.sections: Dict[str, List[Section]] = collections.defaultdict(list)
         self.variables: Dict[str, Any] = {}
 
+        # Sections whose defaults are already resolved
+        self._resolved_sections: Set[str] = set()
+
+        # Sections having at least one section which is not a default
+        self._non_default_sections: Set[str] = set()
+
         self._files_listing: Dict[pathlib.Path, List[str]] = {}
 
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        """Restore a pickled parser.
+
+        Parsers pickled by previous versions do not know which sections are resolved.
+
+        :param state: Attributes of the parser
+        """
+        state.setdefault("_resolved_sections", set())
+        if "_non_default_sections" not in state:
+            state["_non_default_sections"] = {
+                section_name
+                for section_name, sections in state["sections"].items()
+                if not all(self._is_default(section) for section in sections)
+            }
+
+        self.__dict__.update(state)
+
     # Public API
     def list_section(self, with_defaults: bool = False) -> List[str]:
         """List sections found in AOSP.
@@ -183,14 +398,14 @@ class SoongParser:
         :param with_defaults: Also include defaults sections in the results
         :return: A list of sections
         """
-        section_list: List[str] = []
-        for section_name, targets in self.sections.items():
-            if with_defaults or any(
-                "default" not in target.get(self.SECTION_TYPE, "") for target in targets
-            ):
-                section_list.append(section_name)
+        if with_defaults:
+            return list(self.sections)
 
-        return section_list
+        return [
+            section_name
+            for section_name in self.sections
+            if section_name in self._non_default_sections
+        ]
 
     @overload
     def get_section(self, section_name: str) -> List[Section]:
@@ -244,6 +459,9 @@ class SoongParser:
         if project_variables is None:
             project_variables = {}
 
+        # Wrap the path only once, the same object is stored in every section
+        file_path = pathlib.Path(file_path)
+
         try:
             parser = SoongFileParser(file_path, project_variables)
         except bgraph.exc.BGraphParserException:
@@ -256,15 +474,19 @@ class SoongParser:
         # the sections, namely where was the initial file located and the root source of
         # the project. This will be handy when resolving relative paths.
         if project_name is not None:
+            # The annotations are the same for every section of the file
+            annotations: Section = {
+                self.SECTION_PROJECT: project_name,
+                self.SOONG_FILE: file_path,
+            }
+            if project_path is not None:
+                annotations[self.SECTION_PROJECT_PATH] = project_path
+
             for section_name, sections in parser.sections.items():
                 for section in sections:
-                    section[self.SECTION_PROJECT] = project_name
-                    section[self.SOONG_FILE] = pathlib.Path(file_path)
-
-                    if project_path is not None:
-                        section[self.SECTION_PROJECT_PATH] = project_path
+                    section.update(annotations)
 
-                    self.sections[section_name].append(section)
+                self._add_sections(section_name, sections)
 
         project_variables.update(parser.variables)
         self.variables.update(parser.variables)
@@ -274,6 +496,7 @@ class SoongParser:
         aosp_directory: Union[str, pathlib.Path],
         file_name: Optional[str] = None,
         project_map: Dict = None,
+        parallel: bool = False,
     ) -> None:
         """Parses an AOSP tree.
 
@@ -282,9 +505,15 @@ class SoongParser:
 
         The project map is needed because it needs to know the root tree of a project.
 
+        Projects are independent (variables are scoped to a project) so they may be
+        parsed in parallel, the results being merged in the order of the project map.
+        Note: the parallel parsing spawns processes so it must not be used from a
+        daemonic process (e.g. inside a multiprocessing.Pool).
+
         :param aosp_directory: Root tree of AOSP
         :param file_name: Optional Name of file
         :param project_map: A map of project name / project path
+        :param parallel: Optional. Parse the projects in parallel
         """
         if file_name is None:
             file_name = self.DEFAULT_FILENAME
@@ -293,19 +522,58 @@ class SoongParser:
             raise bgraph.exc.BGraphParserException("Missing project map.")
 
         aosp_directory = pathlib.Path(aosp_directory)
-        for project_name, relative_path in project_map.items():
-            project_path = aosp_directory / relative_path
-            self.parse_project(
-                project_directory=project_path,
-                file_name=file_name,
-                project_name=project_name,
+        projects_path: Dict[str, pathlib.Path] = {
+            project_name: aosp_directory / relative_path
+            for project_name, relative_path in project_map.items()
+        }
+
+        # Walk the tree once instead of once per project (and per generic directory)
+        directories = set(projects_path.values())
+        directories.update(path.parent / "generic" for path in projects_path.values())
+        soong_files = self._find_soong_files(aosp_directory, file_name, directories)
+
+        if not parallel:
+            for project_name, project_path in projects_path.items():
+                self.parse_project(
+                    project_directory=project_path,
+                    file_name=file_name,
+                    project_name=project_name,
+                    soong_files=soong_files,
+                )
+            return
+
+        # Only send to each worker the files of its project
+        projects_soong_files = [
+            {
+                directory: soong_files[directory]
+                for directory in (project_path, project_path.parent / "generic")
+                if directory in soong_files
+            }
+            for project_path in projects_path.values()
+        ]
+
+        with concurrent.futures.ProcessPoolExecutor() as executor:
+            results = executor.map(
+                _parse_project,
+                projects_path.values(),
+                projects_path.keys(),
+                itertools.repeat(file_name),
+                projects_soong_files,
+                chunksize=bgraph.utils.get_chunksize(len(projects_path)),
             )
 
+            for sections, variables in results:
+                for section_name, project_sections in sections.items():
+                    self._add_sections(section_name, project_sections)
+
+                self.variables.update(variables)
+
     def parse_project(
         self,
         project_directory: Union[str, pathlib.Path],
         project_name: str,
         file_name: Optional[str] = None,
+        soong_files: Optional[Dict[pathlib.Path, List[pathlib.Path]]] = None,
     ) -> None:
         """Parse a project inside AOSP
 
@@ -315,13 +583,20 @@ class SoongParser:
         :param project_directory: Path towards the project
         :param project_name: Name of the project
         :param file_name: Name of the soong files
+        :param soong_files: Optional. Soong files already found in directories (see
+            `_find_soong_files`). Other directories are searched.
         """
         if file_name is None:
             file_name = self.DEFAULT_FILENAME
 
+        if soong_files is None:
+            soong_files = {}
+
         project_directory = pathlib.Path(project_directory)
         project_variables: Dict[str, Any] = {}
-        for soong_file in project_directory.rglob(file_name):
+        for soong_file in self._list_soong_files(
+            project_directory, file_name, soong_files
+        ):
             self.parse_file(
                 file_path=soong_file,
                 project_name=project_name,
@@ -333,7 +608,9 @@ class SoongParser:
         # We try to include also Build Files files from those directories here to handle this case
         # This is a *dirty* hack and it should not be necessary when the project is from
         # the manifest.
-        for soong_file in (project_directory.parent / "generic").rglob(file_name):
+        for soong_file in self._list_soong_files(
+            project_directory.parent / "generic", file_name, soong_files
+        ):
             self.parse_file(file_path=soong_file)
 
     def get_targets(self) -> List[str]:
@@ -350,30 +627,44 @@ class SoongParser:
 
         :return: A list of section having a "binary" target.
         """
+        section_type_key: str = self.SECTION_TYPE
+        library_types: FrozenSet[str] = self.LIBRARY_TYPES
+        binary_types: FrozenSet[str] = self.BINARY_TYPES
+
         target_list: List[str] = []
-        for section_name in self.list_section(with_defaults=False):
-            section_map: List[Section] = self.get_section(section_name)
+        # Same as iterating over list_section() but in a single pass
+        for section_name in self.sections:
+            if section_name not in self._non_default_sections:
+                continue
+
+            section_map: List[Section] = self._retrieve_section(section_name)
 
             for section in section_map:
-                section_type = section.get(self.SECTION_TYPE)
+                section_type = section.get(section_type_key)
 
-                if section_type in [
-                    "cc_library",
-                    "cc_library_shared",
-                    "cc_library_static",
-                ]:
+                if section_type in library_types:
                     # The target is actually the name of the section. Manual says it can
                     # be overriden but I did not find any evidence of that.
                     # TODO(dm) : see if the name if overriden & check if the lib is not
                     #  disabled for target ? (how?)
                     target_list.append(section_name)
-                elif section_type in [
-                    "cc_binary",
-                ]:
+                elif section_type in binary_types:
                     target_list.append(section_name)
 
         return target_list
 
+    def get_projects_path(self) -> Set[pathlib.Path]:
+        """Compute the paths of the projects having at least a section.
+
+        :return: A set of projects path
+        """
+        return {
+            section[self.SECTION_PROJECT_PATH]
+            for sections in self.sections.values()
+            for section in sections
+            if self.SECTION_PROJECT_PATH in section
+        }
+
     @property
     def file_listing(self) -> Dict[pathlib.Path, List[str]]:
         """A map of every paths and files inside the project.
@@ -393,6 +684,91 @@ class SoongParser:
 
     # Private method
     # ##############
+    @classmethod
+    def _is_default(cls, section: Section) -> bool:
+        """Check if a section is a default (e.g. cc_defaults).
+
+        :param section: The section
+        :return: True if the section type is a default
+        """
+        return "default" in section.get(cls.SECTION_TYPE, "")
+
+    def _add_sections(self, section_name: str, sections: List[Section]) -> None:
+        """Add sections to the parser.
+
+        :param section_name: Name of the sections
+        :param sections: Sections to add
+        """
+        self.sections[section_name].extend(sections)
+        self._resolved_sections.discard(section_name)
+
+        if not all(self._is_default(section) for section in sections):
+            self._non_default_sections.add(section_name)
+
+    @staticmethod
+    def _find_soong_files(
+        root_directory: pathlib.Path,
+        file_name: str,
+        directories: Set[pathlib.Path],
+    ) -> Dict[pathlib.Path, List[pathlib.Path]]:
+        """Find the soong files below each directory with a single walk of the tree.
+
+        The files are listed in the same order as `pathlib.Path.rglob` would (parent
+        first, symbolic links to directories not followed). Directories not found
+        during the walk (e.g. missing) are not in the result.
+
+        :param root_directory: Root of the walk
+        :param file_name: Name of the soong files
+        :param directories: Directories for which the soong files are wanted
+        :return: A mapping between the directories and the soong files below them
+        """
+        wanted: Dict[str, pathlib.Path] = {str(path): path for path in directories}
+        found_files: List[pathlib.Path] = []
+        ranges: Dict[pathlib.Path, Tuple[int, int]] = {}
+
+        def walk(directory: str) -> None:
+            # In a depth-first walk, the files below a directory are contiguous
+            start = len(found_files)
+            sub_directories: List[str] = []
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name not in IGNORED_DIRECTORIES:
+                                sub_directories.append(entry.path)
+                        elif entry.name == file_name:
+                            found_files.append(pathlib.Path(entry.path))
+            except OSError:
+                pass
+
+            for sub_directory in sub_directories:
+                walk(sub_directory)
+
+            if directory in wanted:
+                ranges[wanted[directory]] = (start, len(found_files))
+
+        walk(str(root_directory))
+
+        return {path: found_files[start:end] for path, (start, end) in ranges.items()}
+
+    @staticmethod
+    def _list_soong_files(
+        directory: pathlib.Path,
+        file_name: str,
+        soong_files: Dict[pathlib.Path, List[pathlib.Path]],
+    ) -> Iterable[pathlib.Path]:
+        """List the soong files below a directory.
+
+        :param directory: Directory to search
+        :param file_name: Name of the soong files
+        :param soong_files: Soong files already found (see `_find_soong_files`)
+        :return: The soong files
+        """
+        if directory in soong_files:
+            return soong_files[directory]
+
+        return directory.rglob(file_name)
+
     @overload
     def _retrieve_section(self, section_name: str, recursive: bool) -> Section:
         ...
@@ -421,6 +797,20 @@ class SoongParser:
         if projects is None:
             raise bgraph.exc.BGraphMissingSectionException()
 
+        if section_name not in self._resolved_sections:
+            self._resolve_defaults(section_name, projects)
+
+        if recursive is True:
+            return self.sections[section_name][0]
+        else:
+            return self.sections[section_name]
+
+    def _resolve_defaults(self, section_name: str, projects: List[Section]) -> None:
+        """Merge every section having this name with its defaults.
+
+        :param section_name: Name of the section
+        :param projects: Sections having this name
+        """
         # Iterate through the sections
         for index, section_map in enumerate(projects):
             defaults_list = section_map.get("defaults")
@@ -447,10 +837,7 @@ class SoongParser:
             self.sections[section_name][index] = section_map
             del self.sections[section_name][index]["defaults"]
 
-        if recursive is True:
-            return self.sections[section_name][0]
-        else:
-            return self.sections[section_name]
+        self._resolved_sections.add(section_name)
 
     @staticmethod
     def _merge_section(section_map: Section, default_map: Section) -> Section:
@@ -466,29 +853,50 @@ class SoongParser:
         :return: An updated initial map.
         """
 
-        def recursive_merge(mapping, local_key, local_val):
-            if local_key not in mapping:
-                mapping[local_key] = local_val
-            else:
-                # Overwrite the value in case of boolean or string
-                if type(local_val) in (str, bool, int):
-                    mapping[local_key] = local_val
+        def copy_value(value):
+            # Sections only hold dicts, lists and immutable values: copy the containers
+            # without the overhead of copy.deepcopy
+            value_type = type(value)
+            if value_type is dict:
+                return {
+                    nested_key: copy_value(nested_val)
+                    for nested_key, nested_val in value.items()
+                }
+            elif value_type is list:
+                return list(value)
+
+            return value
+
+        final_map = copy_value(default_map)
+        for key, val in section_map.items():
+            _merge_value(final_map, key, val)
 
-                elif type(local_val) is list:
-                    mapping[local_key] = local_val + list(mapping[local_key])
+        return final_map
 
-                elif type(local_val) is dict:
-                    for nested_key, nested_val in local_val.items():
-                        recursive_merge(mapping[local_key], nested_key, nested_val)
 
-                else:  # For other types (like Paths), overwrite
-                    mapping[local_key] = local_val
+def _parse_project(
+    project_directory: pathlib.Path,
+    project_name: str,
+    file_name: str,
+    soong_files: Dict[pathlib.Path, List[pathlib.Path]],
+) -> Tuple[Dict[str, List[Section]], Dict[str, Any]]:
+    """Parse a project in a worker process, see `SoongParser.parse_aosp`.
 
-        final_map = copy.deepcopy(default_map)
-        for key, val in section_map.items():
-            recursive_merge(final_map, key, val)
+    :param project_directory: Path towards the project
+    :param project_name: Name of the project
+    :param file_name: Name of the soong files
+    :param soong_files: Soong files already found for the project
+    :return: The sections and the variables of the project
+    """
+    soong_parser = SoongParser()
+    soong_parser.parse_project(
+        project_directory=project_directory,
+        project_name=project_name,
+        file_name=file_name,
+        soong_files=soong_files,
+    )
 
-        return final_map
+    return dict(soong_parser.sections), soong_parser.variables
 
 
 class SoongFileParser:
@@ -506,6 +914,12 @@ class SoongFileParser:
     :param sections (Dict): Mapping of the sections and their content
     """
 
+    _PARSER: Optional[pyparsing.ParserElement] = None
+    """Grammar shared by every instance, created on first use."""
+
+    _CURRENT: threading.local = threading.local()
+    """Instance (per thread) receiving the results of the parse actions."""
+
     def __init__(
         self,
         file_path: Optional[Union[pathlib.Path, str]] = None,
@@ -520,14 +934,40 @@ class SoongFileParser:
 
         self.sections: Dict[str, List[Section]] = collections.defaultdict(list)
 
-        self.parser: pyparsing.ParserElement = self._init_parser()
+        self.parser: pyparsing.ParserElement = self._get_parser()
 
         if file_path:
-            self.parser.parseFile(pathlib.Path(file_path).as_posix())
+            content = self._read_file(file_path)
+
+            previous = getattr(self._CURRENT, "parser", None)
+            self._CURRENT.parser = self
+            try:
+                self.parser.parseString(content)
+            finally:
+                self._CURRENT.parser = previous
+
             if self.identifiers or not (self.sections or self.variables):
 
                 raise bgraph.exc.BGraphParserException("An error ocured during parsing")
 
+    @staticmethod
+    def _read_file(file_path: Union[pathlib.Path, str]) -> str:
+        """Read a blueprint file with a single read.
+
+        pyparsing needs a str, so the file is not memory mapped (the mapping would be
+        copied anyway). New lines are translated as open() in text mode would do.
+
+        :param file_path: Path of the file
+        :return: The content of the file
+        """
+        with open(file_path, "rb") as file:
+            content = file.read().decode("utf-8")
+
+        if "\r" in content:
+            content = content.replace("\r\n", "\n").replace("\r", "\n")
+
+        return content
+
     # Parsing method helpers
     @staticmethod
     def parse_boolean(tokens: List[Any]) -> bool:
@@ -597,11 +1037,10 @@ class SoongFileParser:
                     "Missing previous variable during append"
                 )
 
-            if type(new_value) != type(actual_value):
-                new_value = [new_value] if type(new_value) is str else new_value
-                actual_value = (
-                    [actual_value] if type(actual_value) is str else actual_value
-                )
+            new_type, actual_type = type(new_value), type(actual_value)
+            if new_type is not actual_type:
+                new_value = [new_value] if new_type is str else new_value
+                actual_value = [actual_value] if actual_type is str else actual_value
 
             self.variables[variable_name] = actual_value + new_value
 
@@ -612,15 +1051,38 @@ class SoongFileParser:
         :param tokens: Tokens
         :return: Optionnaly a string string
         """
-        final_token = ""
-        for token in tokens:
-            if type(token) is str:
-                final_token += token
-            else:
-                # Do not raise an exception as it may mess up with pyparsing
-                return None
+        if not all(isinstance(token, str) for token in tokens):
+            # Do not raise an exception as it may mess up with pyparsing
+            return None
 
-        return final_token
+        return "".join(tokens)
+
+    @staticmethod
+    def parse_string_list(tokens: List[str]) -> List[List[str]]:
+        """Helper method to parse a list made only of quoted strings
+
+        The strings are unquoted as pyparsing.QuotedString does.
+
+        :param tokens: Tokens (the whole list)
+        :return: The list of strings (as a single token)
+        """
+        strings: List[str] = []
+        for quoted_string in QUOTED_STRING.findall(tokens[0]):
+            string = quoted_string[1:-1]
+            if "\\" in string:
+                for escaped, character in (
+                    (r"\t", "\t"),
+                    (r"\n", "\n"),
+                    (r"\f", "\f"),
+                    (r"\r", "\r"),
+                ):
+                    string = string.replace(escaped, character)
+
+                string = ESCAPED_CHARACTER.sub(r"\g<1>", string)
+
+            strings.append(string)
+
+        return [strings]
 
     @staticmethod
     def parse_list_concat(tokens: List[str]) -> List[Any]:
@@ -632,9 +1094,9 @@ class SoongFileParser:
 
         final_list: List[Any] = []
         for token in tokens:
-            if type(token) is list:
+            if isinstance(token, list):
                 final_list.extend(token)
-            elif type(token) is str:
+            elif isinstance(token, str):
                 final_list.append(token)
             else:
                 # Do not raise an exception as it may mess with pyparsing
@@ -713,7 +1175,27 @@ class SoongFileParser:
 
         self.sections[section_name].append(section_dict)
 
-    def _init_parser(self) -> pyparsing.ParserElement:
+    @classmethod
+    def _get_parser(cls) -> pyparsing.ParserElement:
+        """Get the grammar, creating it only once.
+
+        :return: A pyparsing Parser
+        """
+        if cls._PARSER is None:
+            cls._PARSER = cls._init_parser()
+
+        return cls._PARSER
+
+    @classmethod
+    def _current(cls) -> "SoongFileParser":
+        """Get the instance currently parsing a file in this thread.
+
+        :return: A SoongFileParser
+        """
+        return cls._CURRENT.parser
+
+    @classmethod
+    def _init_parser(cls) -> pyparsing.ParserElement:
         """Main method: create the parser for the blueprint syntax.
 
         This is a best effort parser and some edges cases are not correct. A lof of work
@@ -723,6 +1205,9 @@ class SoongFileParser:
         TODO(dm):
             - Map append {} + {}
 
+        The grammar does not depend on the instance: the parse actions updating the
+        parser state are dispatched to the instance returned by `_current`.
+
         :return: A pyparsing Parser
         """
 
@@ -738,52 +1223,60 @@ class SoongFileParser:
         true = pyparsing.Keyword("true")
         false = pyparsing.Keyword("false")
         boolean = true | false
-        boolean.setName("bool").setParseAction(self.parse_boolean)
+        boolean.setName("bool").setParseAction(cls.parse_boolean)
 
         # Identifiers & variables references
         # FIX: does not allow variable starting with numbers
-        variable = ~boolean + pyparsing.Word(
-            pyparsing.alphas + "_", pyparsing.alphanums + "_"
-        )
-        identifier = variable.copy().setName("identifier")
+        # A single regex (matched in C) instead of ~boolean + Word. Both elements are
+        # created from the pattern rather than copied from a common element.
+        identifier = pyparsing.Regex(IDENTIFIER_PATTERN).setName("identifier")
         variable_ref = (
-            variable.copy().setName("var-ref").setParseAction(self.parse_variable_ref)
+            pyparsing.Regex(IDENTIFIER_PATTERN)
+            .setName("var-ref")
+            .setParseAction(lambda t: cls._current().parse_variable_ref(t))
         )
 
         # Integers (not used?)
         integer = (
             pyparsing.Word(pyparsing.nums)
             .setName("integer")
-            .setParseAction(self.parse_integer)
+            .setParseAction(cls.parse_integer)
         )
 
         # String concatenation
         string_concat = pyparsing.delimitedList(
             quoted_string | variable_ref, delim=plus
         )
-        string_concat.setName("string-concat").setParseAction(self.parse_string_concat)
+        string_concat.setName("string-concat").setParseAction(cls.parse_string_concat)
 
         # List of strings
-        string_list = (
+        generic_string_list = (
             lbrack
             + pyparsing.ZeroOrMore(pyparsing.delimitedList(string_concat, delim=comma))
             + pyparsing.Optional(comma)
             + rbrack
         )
+        generic_string_list.setParseAction(lambda t: [t[::]])
 
-        string_list.setParseAction(lambda t: [t[::]]).setName("string-list")
+        # Most lists only contain literal strings: match them with a single regex
+        # instead of an element (and a ParseResults) per string and delimiter.
+        literal_string_list = pyparsing.Regex(STRING_LIST_PATTERN, flags=re.DOTALL)
+        literal_string_list.setParseAction(cls.parse_string_list)
+
+        string_list = literal_string_list | generic_string_list
+        string_list.setName("string-list")
 
         # List concatenation: ref + list // list + list // var + var
         list_concat = pyparsing.delimitedList(variable_ref | string_list, delim=plus)
-        list_concat.setName("list-concat").setParseAction(self.parse_list_concat)
+        list_concat.setName("list-concat").setParseAction(cls.parse_list_concat)
 
         # Dict special field
         dict_body = pyparsing.Forward()
         dict_def = lbrace + dict_body("dict_body") + pyparsing.Optional(comma) + rbrace
         dict_def.setName("dict-def")
 
-        # All possibles values for a "value" (order does not matter)
-        value = pyparsing.Or(
+        # All possibles values for a "value" (the longest match wins)
+        longest_value = pyparsing.Or(
             [
                 boolean,
                 integer,
@@ -796,11 +1289,32 @@ class SoongFileParser:
             ]
         )
 
+        # pyparsing.Or tries every alternative before parsing the longest one again.
+        # Instead, a value not followed by a concatenation is complete: the first
+        # alternative matching it is used. Booleans, integers and dicts are only matched
+        # by their own alternative. Other values (e.g. "a" + ["b"]) still go through Or.
+        # FIX: with Or, the concatenations also consumed the trailing whitespace and won
+        # over simple values, flattening single element lists to strings.
+        not_concat = ~plus
+        value = pyparsing.MatchFirst(
+            [
+                boolean,
+                integer,
+                dict_def,
+                quoted_string + not_concat,
+                string_list + not_concat,
+                variable_ref + not_concat,
+                list_concat + not_concat,
+                string_concat + not_concat,
+                longest_value,
+            ]
+        )
+
         # Continue dict definition
         dict_field = identifier + colon + value
-        dict_field.setParseAction(self.parse_dict_field)
+        dict_field.setParseAction(cls.parse_dict_field)
         dict_body <<= pyparsing.ZeroOrMore(pyparsing.delimitedList(dict_field))
-        dict_def.setParseAction(self.parse_dict_def)
+        dict_def.setParseAction(cls.parse_dict_def)
 
         # Sections definitions
         section_body = pyparsing.Forward()
@@ -809,10 +1323,12 @@ class SoongFileParser:
             identifier + lbrace + section_body + pyparsing.Optional(comma) + rbrace
         )
         section_field = identifier + colon + value
-        section_field.setParseAction(self.parse_section_field)
+        section_field.setParseAction(lambda t: cls._current().parse_section_field(t))
         section_body <<= pyparsing.ZeroOrMore(pyparsing.delimitedList(section_field))
 
-        section_def.setName("section-def").setParseAction(self.parse_section)
+        section_def.setName("section-def").setParseAction(
+            lambda t: cls._current().parse_section(t)
+        )
 
         # We can also have direct variables
         variable_def = (
@@ -821,14 +1337,17 @@ class SoongFileParser:
             + value.setResultsName("var-value")
         )
         # variable_def = identifier + equal + value
-        variable_def.setName("var-def").setParseAction(self.parse_variable_def)
+        variable_def.setName("var-def").setParseAction(
+            lambda s, l, t: cls._current().parse_variable_def(s, l, t)
+        )
 
         variable_append = identifier + pyparsing.Literal("+=").suppress() + value
         variable_append.setName("var-append").setParseAction(
-            lambda s, l, t: self.parse_variable_def(s, l, t, append=True)
+            lambda s, l, t: cls._current().parse_variable_def(s, l, t, append=True)
         )
 
         parser = pyparsing.ZeroOrMore(section_def | variable_def | variable_append)
-        parser.ignore(pyparsing.cppStyleComment | pyparsing.cStyleComment)
+        # cppStyleComment already includes cStyleComment: use a single regex
+        parser.ignore(pyparsing.Regex(r"//(?:\\\n|[^\n])*|/\*(?:[^*]|\*(?!/))*\*/"))
 
         return parser
@@ -8,15 +8,20 @@ from typing import (
     cast,
     Dict,
     Final,
+    FrozenSet,
     Generator,
     Iterable,
+    Iterator,
     List,
     Literal,
+    NoReturn,
     Optional,
     overload,
+    Pattern,
     Set,
     Tuple,
     TypedDict,
+    TYPE_CHECKING,
     Union,
 )
 
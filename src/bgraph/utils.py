@@ -1,20 +1,36 @@
+import atexit
 import functools
 import logging
+import multiprocessing
+import multiprocessing.pool
 import pathlib
 
-from bgraph.types import Dict, List, Any, Generator, Tuple, Callable, Union
+from bgraph.types import Dict, List, Any, Generator, Tuple, Callable, Optional, Union
+
+
+_pool: Optional[multiprocessing.pool.Pool] = None
+"""Worker pool shared by the whole application (see `get_pool`)."""
 
 
 def recurse(mapping: Dict[Any, Any]) -> Generator[Tuple[Any, Any], None, None]:
     """Recurse through a mapping and yield every key value pairs.
 
+    The nested dicts are walked with a stack of iterators (instead of recursive
+    generators), so the depth of the mapping is not limited by the recursion limit.
+
     :param mapping: A mapping to unroll
     """
-    for key, value in mapping.items():
-        if type(value) is dict:
-            yield from recurse(value)
-        else:
+    stack = [iter(mapping.items())]
+    while stack:
+        for key, value in stack[-1]:
+            if type(value) is dict:
+                # Continue with the nested dict, then come back to this one
+                stack.append(iter(value.items()))
+                break
+
             yield key, value
+        else:
+            stack.pop()
 
 
 def create_logger(logger_name: str) -> logging.Logger:
@@ -67,3 +83,29 @@ def clean_mirror_path(mirror: str) -> Union[str, pathlib.Path]:
         mirror_path = mirror_path[:-1]
 
     return mirror_path
+
+
+def get_pool() -> multiprocessing.pool.Pool:
+    """Returns the worker pool of the application.
+
+    The pool is created on the first call and reused afterwards, so workers are not
+    forked again for every branch. It is terminated when the interpreter exits.
+
+    :return: A multiprocessing Pool
+    """
+    global _pool
+
+    if _pool is None:
+        _pool = multiprocessing.Pool()
+        atexit.register(_pool.terminate)
+
+    return _pool
+
+
+def get_chunksize(items_count: int) -> int:
+    """Compute the chunksize used to dispatch items_count items to the workers.
+
+    :param items_count: Number of items to dispatch
+    :return: A chunksize (at least 1)
+    """
+    return max(1, items_count // (multiprocessing.cpu_count() * 4))
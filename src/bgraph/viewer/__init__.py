@@ -3,18 +3,20 @@ from bgraph.viewer.viewer import (
     find_sources,
     find_dependency,
     get_node_type,
+    get_graph_node_type,
 )
-from bgraph.viewer.loader import load_graph
+from bgraph.io import load_graph
 from bgraph.viewer.formatter import format_result
 
 __all__ = [
     # From formatter.py
     "format_result",
-    # From loader
+    # From bgraph.io
     "load_graph",
     # From viewer
     "find_target",
     "find_sources",
     "find_dependency",
     "get_node_type",
+    "get_graph_node_type",
 ]
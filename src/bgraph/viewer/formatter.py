@@ -1,14 +1,10 @@
 import networkx  # type: ignore
-import rich.table
-import rich.box
-import rich.console
 import json
 from pathlib import Path
-import pydot  # type: ignore
-import typer
 
 from bgraph.types import (
     BGraph,
+    Callable,
     OutChoice,
     QueryType,
     List,
@@ -22,6 +18,13 @@ import bgraph.viewer
 import bgraph.exc
 
 
+ASCENDING: str = ":heavy_check_mark:"
+"""Marker of the ascending dependencies in the text output."""
+
+NOT_ASCENDING: str = ":heavy_multiplication_x:"
+"""Marker of the other dependencies in the text output."""
+
+
 def format_result(
     graph: BGraph,
     results: List[str],
@@ -38,13 +41,7 @@ def format_result(
     :param out_choice: Out format
     """
 
-    format_methods = {
-        out_choice.TXT: format_text,
-        out_choice.JSON: format_json,
-        out_choice.DOT: format_dot,
-    }
-
-    return format_methods[out_choice](graph, results, query, query_value)
+    return _FORMATTERS[out_choice](graph, results, query, query_value)
 
 
 def format_text(
@@ -59,6 +56,11 @@ def format_text(
     :param query: Type of the query
     :param query_value: Query value
     """
+    # Only the text output needs rich: do not pay for its import in the others.
+    import rich.box
+    import rich.console
+    import rich.table
+
     table = rich.table.Table(box=rich.box.MINIMAL_DOUBLE_HEAD)
 
     if query == QueryType.TARGET:
@@ -67,7 +69,7 @@ def format_text(
         table.add_column("File type", justify="right")
 
         for result in results:
-            table.add_row(result, Path(result).suffix)
+            table.add_row(result, _get_suffix(result))
 
     elif query == QueryType.DEPENDENCY:
         table.title = f"Dependencies for the target {query_value}"
@@ -75,15 +77,15 @@ def format_text(
         table.add_column("Type")
         table.add_column("Ascending")
 
-        for result in sorted(results):
+        # The ascending dependencies are the ones with a path towards the target
+        ancestors = networkx.ancestors(graph, query_value)
+        ancestors.add(query_value)
 
-            ascending = (
-                ":heavy_check_mark:"
-                if networkx.has_path(graph, result, query_value)
-                else ":heavy_multiplication_x:"
-            )
+        for result in sorted(results):
             table.add_row(
-                result, bgraph.viewer.get_node_type(graph.nodes[result]), ascending
+                result,
+                bgraph.viewer.get_graph_node_type(graph, result),
+                ASCENDING if result in ancestors else NOT_ASCENDING,
             )
 
     elif query == QueryType.SOURCE:
@@ -92,22 +94,19 @@ def format_text(
         table.add_column("Type")
         table.add_column("Distance")
 
-        # Generate the graph to compute the distance
-        # Since the graph is much simpler than the original one, it is easier to compute
-        # the distance inside this one.
-        generated_graph: BGraph = networkx.generators.ego_graph(
-            graph, query_value, center=True, radius=None
+        # Compute the distance of every node reachable from the source at once
+        distances: Dict[str, int] = networkx.single_source_shortest_path_length(
+            graph, query_value
         )
 
         row_results: List[Tuple[str, NodeType, int]] = [
             (
                 result,
-                bgraph.viewer.get_node_type(graph.nodes[result]),
-                networkx.algorithms.shortest_path_length(
-                    generated_graph, query_value, result
-                ),
+                bgraph.viewer.get_graph_node_type(graph, result),
+                distances[result],
             )
             for result in results
+            if result in distances
         ]
 
         for result, node_type, distance in sorted(row_results, key=lambda x: x[2]):
@@ -117,6 +116,19 @@ def format_text(
     console.print(table)
 
 
+def _get_suffix(file_name: str) -> str:
+    """Get the suffix of a file name, as pathlib.PurePath.suffix does.
+
+    This avoids creating a path for every row of the output.
+
+    :param file_name: A file name
+    :return: The suffix (with the dot) or an empty string
+    """
+    name = file_name.rstrip("/").rpartition("/")[2]
+    index = name.rfind(".")
+    return name[index:] if 0 < index < len(name) - 1 else ""
+
+
 def format_dot(
     graph: BGraph, results: List[str], query: QueryType, query_value: str
 ) -> None:
@@ -127,28 +139,37 @@ def format_dot(
     :param query: Type of the query
     :param query_value: Query value
     """
+    # Only the DOT output needs pydot
+    import pydot  # type: ignore
 
+    # Use views of the graph: only the nodes and edges are read
     if query == QueryType.SOURCE:
-        subgraph = networkx.generators.ego_graph(
-            graph, query_value, center=True, radius=None
-        )
+        nodes = networkx.descendants(graph, query_value)
+        nodes.add(query_value)
+        subgraph = networkx.subgraph_view(graph, filter_node=nodes.__contains__)
     elif query == QueryType.TARGET:
-        subgraph = networkx.generators.ego_graph(
-            graph.reverse(), query_value, center=True, radius=None
+        nodes = networkx.ancestors(graph, query_value)
+        nodes.add(query_value)
+        subgraph = networkx.reverse_view(
+            networkx.subgraph_view(graph, filter_node=nodes.__contains__)
         )
     elif query == QueryType.DEPENDENCY:
-        subgraph = graph.subgraph(results)
+        subgraph = networkx.subgraph_view(
+            graph, filter_node=frozenset(results).__contains__
+        )
     else:
         raise NotImplementedError("Not implemented yet")
 
-    pydot_graph = networkx.nx_pydot.to_pydot(subgraph)
+    # Clean data: copy the nodes without it before the conversion (to_pydot refuses
+    # the unquoted values of the data anyway)
+    dot_graph: BGraph = networkx.DiGraph()
+    dot_graph.add_nodes_from(
+        (node, {key: value for key, value in node_d.items() if key != "data"})
+        for node, node_d in subgraph.nodes(data=True)
+    )
+    dot_graph.add_edges_from(subgraph.edges(data=True))
 
-    # Clean data
-    for node in pydot_graph.get_nodes():
-        try:
-            del node.obj_dict["attributes"]["data"]
-        except KeyError:
-            pass
+    pydot_graph = networkx.nx_pydot.to_pydot(dot_graph)
 
     try:
         target = pydot_graph.get_node(pydot.quote_if_necessary(query_value))[0]
@@ -158,7 +179,7 @@ def format_dot(
     target.set_shape("box")
     target.set_color("red")
 
-    typer.echo(pydot_graph)
+    print(pydot_graph)
 
 
 def format_json(
@@ -185,19 +206,32 @@ def format_json(
         result_dict["target"] = []
         for result in results:
             result_dict["target"].append(
-                (result, bgraph.viewer.get_node_type(graph.nodes[result]))
+                (result, bgraph.viewer.get_graph_node_type(graph, result))
             )
 
-    typer.echo(
-        json.dumps(
-            {
-                "_meta": {
-                    "query": query_dict[query][0],
-                    "desc": query_dict[query][1],
-                    "query_value": query_value,
-                },
-                "result": result_dict,
-            },
-            indent=True,
-        )
-    )
+    payload = {
+        "_meta": {
+            "query": query_dict[query][0],
+            "desc": query_dict[query][1],
+            "query_value": query_value,
+        },
+        "result": result_dict,
+    }
+
+    # orjson (if installed) is much faster than json, which encodes in Python as soon
+    # as the output is indented. Both give the same output: indented with 2 spaces
+    # (orjson has no other indentation) and non-ASCII characters written as UTF-8.
+    try:
+        import orjson  # type: ignore
+    except ImportError:
+        print(json.dumps(payload, indent=2, ensure_ascii=False))
+    else:
+        print(orjson.dumps(payload, option=orjson.OPT_INDENT_2).decode())
+
+
+_FORMATTERS: Dict[OutChoice, Callable[[BGraph, List[str], QueryType, str], None]] = {
+    OutChoice.TXT: format_text,
+    OutChoice.JSON: format_json,
+    OutChoice.DOT: format_dot,
+}
+"""Format method for every output choice (see `format_result`)."""
@@ -1,19 +1,8 @@
-import pickle
-import pathlib
-
-import bgraph.exc
-from bgraph.types import Union, BGraph
-
-
-def load_graph(graph_path: Union[str, pathlib.Path]) -> BGraph:
-    """Load a B-Graph and return the DiGraph associated.
-
-    :param graph: Path to the graph file (stored with pickle)
-    :return: A DiGraph
-    """
-    try:
-        graph: BGraph = pickle.load(open(graph_path, "rb"))
-    except (pickle.PickleError, FileNotFoundError):
-        raise bgraph.exc.BGraphLoadingException("Unable to load the graph.")
-
-    return graph
+# The graphs are loaded and saved by bgraph.io, shared with the builder. This module
+# is kept so the previous imports still work.
+from bgraph.io import load_graph, save_graph
+
+__all__ = [
+    "load_graph",
+    "save_graph",
+]
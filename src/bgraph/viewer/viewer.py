@@ -1,13 +1,20 @@
+import collections
+import itertools
 import logging
-import functools
+import weakref
 
 import networkx as nx  # type: ignore
 
 import bgraph
+import bgraph.parsers
+import bgraph.utils
 from bgraph.types import (
+    Any,
     List,
     Union,
     Dict,
+    FrozenSet,
+    Iterable,
     Set,
     NodeType,
     Tuple,
@@ -31,6 +38,15 @@ DEFAULT_TYPES: List[NodeType] = [
 ]
 """Default soong types to consider"""
 
+QUERY_CACHE_SIZE: int = 32
+"""Number of results of each query kept per graph.
+
+A result is a tuple of references to the node names of the graph (8 bytes per node):
+a dependency query may return most of the nodes of an AOSP graph (a few MB)."""
+
+_GRAPH_CACHES: Dict[int, Dict[str, Any]] = {}
+"""Values computed on the graphs alive, by graph id (see `_get_graph_cache`)."""
+
 
 @overload
 def get_node_type(node_d: Dict) -> NodeType:
@@ -53,11 +69,14 @@ def get_node_type(
     :param all_types Optional. Return all the types possible for the node
     :return Type(s) of the node
     """
-    try:
-        node_types = [
-            node[bgraph.parsers.SoongParser.SECTION_TYPE] for node in node_d["data"]
-        ]
-    except (TypeError, KeyError):
+    data = node_d.get("data") if isinstance(node_d, dict) else None
+    if not data:
+        return "source" if all_types is False else ["source"]
+
+    section_type = bgraph.parsers.SoongParser.SECTION_TYPE
+    node_types = [node.get(section_type) for node in data]
+    if None in node_types:
+        # A section without a type is not a target
         return "source" if all_types is False else ["source"]
 
     if all_types:
@@ -67,15 +86,92 @@ def get_node_type(
         return node_types.pop()
 
 
-def match_node(graph_srcs: List[str], node_name: str) -> str:
+@overload
+def get_graph_node_type(graph: BGraph, node: str) -> NodeType:
+    ...
+
+
+@overload
+def get_graph_node_type(graph: BGraph, node: str, all_types: bool) -> List[NodeType]:
+    ...
+
+
+def get_graph_node_type(
+    graph: BGraph, node: str, all_types: bool = False
+) -> Union[NodeType, List[NodeType]]:
+    """Get the type of a node of the graph, cached for the graph.
+
+    See `get_node_type`, the returned list must not be modified.
+
+    :param graph: The BGraph
+    :param node: Name of the node
+    :param all_types: Optional. Return all the types possible for the node
+    :return: Type(s) of the node
+    """
+    types = _get_node_types(graph)[node]
+    return types if all_types else types[-1]
+
+
+def _get_node_types(graph: BGraph) -> Dict[str, List[NodeType]]:
+    """Get the types of every node of the graph, computed once per graph.
+
+    The types are extracted from the data of the nodes in a single walk, instead of
+    reading the list of sections of a node every time.
+
+    :param graph: The BGraph
+    :return: A mapping between the nodes and their types (see `get_node_type`)
+    """
+    cache = _get_graph_cache(graph)
+    try:
+        return cache["node_types"]
+    except KeyError:
+        pass
+
+    node_types = cache["node_types"] = {
+        node: get_node_type(node_d, all_types=True)
+        for node, node_d in graph.nodes(data=True)
+    }
+    return node_types
+
+
+def match_node(
+    graph_srcs: List[str],
+    node_name: str,
+    graph_srcs_set: Optional[FrozenSet[str]] = None,
+    graph_srcs_blob: Optional[str] = None,
+) -> str:
     """Search for a node matching the name given as an argument.
 
     :param graph_srcs: A list of source node in the graph
     :param node_name: A node name
+    :param graph_srcs_set: Optional. The same source nodes as a set: a node exactly
+        matching the name is returned without searching the others
+    :param graph_srcs_blob: Optional. The same source nodes, each one surrounded by new
+        lines (see `_get_graph_srcs`): it is searched instead of every node
     :return: A node
     """
-
-    potential_results = [node for node in graph_srcs if node_name in node]
+    if graph_srcs_set is not None and node_name in graph_srcs_set:
+        return node_name
+
+    potential_results: List[str]
+    if graph_srcs_blob is not None and node_name and "\n" not in node_name:
+        # Search the whole blob at once: the node matching is the line of the match
+        index = graph_srcs_blob.find(node_name)
+        if index == -1:
+            potential_results = []
+        else:
+            end = graph_srcs_blob.find("\n", index)
+            start = graph_srcs_blob.rfind("\n", 0, index) + 1
+            potential_results = [graph_srcs_blob[start:end]]
+
+            # Only the other nodes are searched for another match
+            if graph_srcs_blob.find(node_name, end) != -1:
+                potential_results.append(node_name)
+    else:
+        # Two matches are enough to know there are too many
+        potential_results = list(
+            itertools.islice((node for node in graph_srcs if node_name in node), 2)
+        )
 
     if not potential_results:
         raise bgraph.exc.BGraphNodeNotFound("Found 0 results")
@@ -112,36 +208,128 @@ def find_target(
         to node at at most `radius` distance.
     :return: A tuple with the exact match and the list of results
     """
-    graph_srcs: List[str] = get_graph_srcs(graph)
+    graph_srcs, graph_srcs_set, graph_srcs_blob = _get_graph_srcs(graph)
     try:
-        matched_node = match_node(graph_srcs, source)
+        matched_node = match_node(graph_srcs, source, graph_srcs_set, graph_srcs_blob)
     except (bgraph.exc.BGraphNodeNotFound, bgraph.exc.BGraphTooManyNodes) as e:
         logger.info("Failed to find node with error %s", e)
         return "", []
 
-    subgraph = nx.generators.ego_graph(graph, matched_node, center=False, radius=radius)
+    candidates = _get_typed_nodes(graph, return_types)
+
+    # Only the nodes reachable are needed, not the subgraph (ego_graph)
+    reachable = nx.single_source_shortest_path_length(
+        graph, matched_node, cutoff=radius
+    )
     results = [
-        node
-        for node in subgraph
-        if any(
-            node_type in return_types
-            for node_type in get_node_type(graph.nodes[node], all_types=True)
-        )
+        node for node in reachable if node in candidates and node != matched_node
     ]
 
     return matched_node, results
 
 
-@functools.lru_cache(maxsize=8)
+def _get_typed_nodes(graph: BGraph, node_types: Iterable[NodeType]) -> FrozenSet[str]:
+    """Get the nodes of the graph having at least one of the types.
+
+    The index of the nodes by type is built once per graph, and the result is cached
+    for every set of types.
+
+    :param graph: The BGraph
+    :param node_types: Types of the nodes
+    :return: A set of nodes
+    """
+    cache = _get_graph_cache(graph)
+    typed_nodes: Dict[FrozenSet[NodeType], FrozenSet[str]] = cache.setdefault(
+        "typed_nodes", {}
+    )
+    types_key = frozenset(node_types)
+    try:
+        return typed_nodes[types_key]
+    except KeyError:
+        pass
+
+    try:
+        type_index: Dict[NodeType, Set[str]] = cache["type_index"]
+    except KeyError:
+        type_index = collections.defaultdict(set)
+        for node, types in _get_node_types(graph).items():
+            for node_type in types:
+                type_index[node_type].add(node)
+
+        cache["type_index"] = type_index
+
+    nodes = typed_nodes[types_key] = frozenset().union(
+        *(type_index[node_type] for node_type in types_key if node_type in type_index)
+    )
+
+    return nodes
+
+
 def get_graph_srcs(graph: BGraph) -> List[str]:
     """Filter the graph to return only source nodes.
 
     This method is used to improve the efficiency of the `match_node` method.
 
+    The result is cached as long as the graph is alive, so the graph must not be
+    modified after the first call.
+
     :param graph: The BGraph to filter
     :return: A list of graph nodes representing source file.
     """
-    return [node for node in graph if get_node_type(node) == "source"]
+    return _get_graph_srcs(graph)[0]
+
+
+def _get_graph_srcs(
+    graph: BGraph,
+) -> Tuple[List[str], FrozenSet[str], Optional[str]]:
+    """Get the source nodes of the graph, as a list, a set and a blob.
+
+    Sources nodes have no data associated (see `get_node_type`). The blob is the string
+    of the nodes separated (and surrounded) by new lines, searched by `match_node`. It
+    is None if a node has a new line in its name.
+
+    :param graph: The BGraph to filter
+    :return: A tuple with the list, the set and the blob of the source nodes
+    """
+    cache = _get_graph_cache(graph)
+    try:
+        return cache["srcs"]
+    except KeyError:
+        pass
+
+    graph_srcs = [
+        node for node, node_d in graph.nodes(data=True) if not node_d.get("data")
+    ]
+    blob = "\n{}\n".format("\n".join(graph_srcs))
+    graph_srcs_blob = blob if blob.count("\n") == len(graph_srcs) + 1 else None
+
+    result = graph_srcs, frozenset(graph_srcs), graph_srcs_blob
+
+    cache["srcs"] = result
+    return result
+
+
+def _get_graph_cache(graph: BGraph) -> Dict[str, Any]:
+    """Get the dict storing the values computed on a graph.
+
+    The values are kept as long as the graph is alive, so the graph must not be
+    modified once they are computed.
+
+    :param graph: The BGraph
+    :return: The cache of the graph
+    """
+    graph_id = id(graph)
+    try:
+        return _GRAPH_CACHES[graph_id]
+    except KeyError:
+        pass
+
+    # The entry is removed when the graph is collected, before its id may be reused
+    cache: Dict[str, Any] = {}
+    _GRAPH_CACHES[graph_id] = cache
+    weakref.finalize(graph, _GRAPH_CACHES.pop, graph_id, None)
+
+    return cache
 
 
 def find_dependency(graph: BGraph, origin: str) -> List[str]:
@@ -158,13 +346,18 @@ def find_dependency(graph: BGraph, origin: str) -> List[str]:
         logger.error("Origin not found %s", origin)
         return []
 
-    # Get dependencies in the graph
-    subgraph = nx.generators.ego_graph(graph, origin, radius=None, center=True)
-    other_subgraph = nx.generators.ego_graph(
-        graph.reverse(), origin, center=True, radius=None
-    )
+    queries = _get_query_cache(graph, "dependencies")
+    if origin in queries:
+        queries.move_to_end(origin)
+        return list(queries[origin])
+
+    # Get dependencies in the graph (in both directions, without copying the graph)
+    dependencies: Set[str] = nx.descendants(graph, origin)
+    dependencies |= nx.ancestors(graph, origin)
+    dependencies.add(origin)
 
-    return list(set(subgraph).union(set(other_subgraph)))
+    _store_query(queries, origin, tuple(dependencies))
+    return list(dependencies)
 
 
 def find_sources(graph: BGraph, target: str) -> List[str]:
@@ -184,15 +377,88 @@ def find_sources(graph: BGraph, target: str) -> List[str]:
     if target not in graph:
         return []
 
-    subgraph = nx.generators.ego_graph(
-        graph.reverse(), target, radius=None, center=False
-    )
-    dependencies = [
-        node for node in subgraph if next(subgraph.successors(node), None) is None
-    ]
+    queries = _get_query_cache(graph, "sources")
+    if target in queries:
+        queries.move_to_end(target)
+        return list(queries[target])
+
+    # Walk the predecessors of the target (without reversing the graph): the sources
+    # are the ones without other predecessors than the target.
+    predecessors = graph.pred
+    roots = _get_graph_roots(graph)
+    visited: Set[str] = {target}
+    frontier: List[str] = [target]
+    dependencies: List[str] = []
+    while frontier:
+        next_frontier: List[str] = []
+        for node in frontier:
+            for predecessor in predecessors[node]:
+                if predecessor in visited:
+                    continue
+
+                visited.add(predecessor)
+                next_frontier.append(predecessor)
+                if predecessor in roots or (
+                    len(predecessors[predecessor]) == 1
+                    and target in predecessors[predecessor]
+                ):
+                    dependencies.append(predecessor)
+
+        frontier = next_frontier
 
     # Filtering step: since we don't understand conditionals (yet), filter out bogus
     # dependencies
     # TODO(dm)
 
+    _store_query(queries, target, tuple(dependencies))
     return dependencies
+
+
+def _get_graph_roots(graph: BGraph) -> FrozenSet[str]:
+    """Get the nodes of the graph without predecessors, computed once per graph.
+
+    They are the source files, and the targets without any input.
+
+    :param graph: The BGraph
+    :return: A set of nodes
+    """
+    cache = _get_graph_cache(graph)
+    try:
+        return cache["roots"]
+    except KeyError:
+        pass
+
+    roots = cache["roots"] = frozenset(
+        node for node, in_degree in graph.in_degree() if in_degree == 0
+    )
+    return roots
+
+
+def _get_query_cache(
+    graph: BGraph, query_name: str
+) -> "collections.OrderedDict[str, Tuple[str, ...]]":
+    """Get the least recently used results of a query on a graph.
+
+    The results are stored as tuples: they are returned to the caller as new lists.
+
+    :param graph: The BGraph
+    :param query_name: Name of the query
+    :return: An ordered mapping between the query values and the results
+    """
+    return _get_graph_cache(graph).setdefault(query_name, collections.OrderedDict())
+
+
+def _store_query(
+    queries: "collections.OrderedDict[str, Tuple[str, ...]]",
+    query_value: str,
+    results: Tuple[str, ...],
+) -> None:
+    """Store the results of a query, and forget the least recently used ones.
+
+    :param queries: Results of the query (see `_get_query_cache`)
+    :param query_value: Value queried
+    :param results: Results of the query
+    """
+    queries[query_value] = results
+    if len(queries) > QUERY_CACHE_SIZE:
+        queries.popitem(last=False)
@@ -0,0 +1,74 @@
+from pathlib import Path
+
+from bgraph.builder.graph import (
+    compute_file_list,
+    convert_section,
+    filter_files,
+    index_project_files,
+)
+from bgraph.parsers import SoongParser
+
+
+def test_index_project_files():
+    project_path = Path("/aosp/external/foo")
+    index = index_project_files(project_path, ["a.c", "lib/b.c", "lib/sub/c.c"])
+
+    assert index[project_path.parts] == ["a.c", "lib/b.c", "lib/sub/c.c"]
+    assert index[(project_path / "lib").parts] == ["b.c", "sub/c.c"]
+    assert index[(project_path / "lib" / "sub").parts] == ["c.c"]
+
+
+def test_compute_file_list():
+    project_path = Path("/aosp/external/foo")
+    files = ["a.c", "lib/b.c", "libfoo/d.c"]
+    section_files = {}
+    project_index = {}
+
+    result = compute_file_list(
+        section_files, project_index, project_path / "lib", project_path, files
+    )
+
+    # Sibling directories sharing a prefix must not be included
+    assert result == (["b.c"], frozenset({"b.c"}))
+    assert section_files[project_path / "lib"] == result
+    assert project_path in project_index
+
+    # Soong files outside of the project have no files
+    assert compute_file_list(
+        section_files, project_index, Path("/aosp/other"), project_path, files
+    ) == ([], frozenset())
+
+
+def test_filter_files():
+    files = ["a.c", "b.cpp", "lib/c.c"]
+    files_set = frozenset(files)
+
+    # Literal patterns
+    assert filter_files(files, files_set, "a.c") == ["a.c"]
+    assert filter_files(files, files_set, "missing.c") == []
+
+    # Wildcards behave like fnmatch
+    assert filter_files(files, files_set, "*.c") == ["a.c", "lib/c.c"]
+    assert filter_files(files, files_set, "?.cpp") == ["b.cpp"]
+
+
+def test_convert_section():
+    project_path = Path("/aosp/external/foo")
+    section = {
+        SoongParser.SECTION_PROJECT_PATH: project_path,
+        SoongParser.SOONG_FILE: project_path / "Android.bp",
+        "srcs": ["./a.c", "lib/*.c"],
+        "shared_libs": ["libc"],
+    }
+
+    edges = convert_section(
+        {}, {}, "libfoo", section, ["Android.bp", "a.c", "lib/b.c", "lib/b.h"]
+    )
+    assert sorted(edges) == [
+        (str(project_path / "a.c"), "libfoo", "src"),
+        (str(project_path / "lib" / "b.c"), "libfoo", "src"),
+        ("libc", "libfoo", "dep"),
+    ]
+
+    # Sections without a project path have no edges
+    assert convert_section({}, {}, "libfoo", {}, []) == []
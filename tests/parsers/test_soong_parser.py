@@ -1,6 +1,13 @@
-from bgraph.parsers.soong_parser import SoongFileParser, SoongParser
+import base64
+import pickle
+
+from bgraph.parsers.soong_parser import Manifest, SoongFileParser, SoongParser
 from pathlib import Path
 
+import pytest
+
+import bgraph.exc
+
 
 TEST_DIR = Path(__file__).parent.parent
 
@@ -50,6 +57,20 @@ def test_list_parsing():
     assert not diff
 
 
+def test_concat_parsing():
+    soong_parser = SoongFileParser(get_blueprint_path("concat"))
+    section = get_first_section(soong_parser, "libconcat")
+
+    assert section["cflags"] == ["-O2", "-g"]
+    assert section["header_libs"] == ["liba", "libb"]
+    assert section["shared_libs"] == ["libc", "-Wall"]
+    assert section["stem"] == "libconcat"
+
+    # Single element lists stay lists, even at the end of a line
+    assert section["srcs"] == ["single.c"]
+    assert soong_parser.variables["single_flag"] == ["-Wall"]
+
+
 def test_variables_parsing():
     soong_parser = SoongFileParser(get_blueprint_path("variables"))
     section = get_first_section(soong_parser, "linker")
@@ -68,3 +89,144 @@ def test_dict_parsing():
 
     assert section.get("arch") is not None
     assert section["arch"].get("arm", {}).get("instruction_set") == "arm"
+
+
+def test_shared_grammar():
+    first_parser = SoongFileParser(get_blueprint_path("dict"))
+    second_parser = SoongFileParser(get_blueprint_path("variables"))
+
+    assert first_parser.parser is second_parser.parser
+    assert "libnfc-nci" not in second_parser.sections
+    assert not first_parser.variables
+
+
+def test_merge_section():
+    default_map = {
+        SoongParser.SECTION_TYPE: "cc_defaults",
+        "cflags": ["-Wall"],
+        "arch": {"arm": {"srcs": ["arm.c"]}},
+    }
+    section_map = {
+        SoongParser.SECTION_TYPE: "cc_binary",
+        "cflags": ["-O2"],
+        "arch": {"arm": {"srcs": ["main.c"]}},
+    }
+
+    merged = SoongParser._merge_section(section_map, default_map)
+
+    assert merged[SoongParser.SECTION_TYPE] == "cc_binary"
+    assert merged["cflags"] == ["-O2", "-Wall"]
+    assert merged["arch"]["arm"]["srcs"] == ["main.c", "arm.c"]
+
+    # The default is left untouched for the other sections using it
+    assert default_map["arch"] == {"arm": {"srcs": ["arm.c"]}}
+
+
+def test_find_soong_files(tmp_path):
+    for directory in ["project", "project/sub", "project/.git", "other"]:
+        (tmp_path / directory).mkdir(parents=True)
+        (tmp_path / directory / "Android.bp").touch()
+
+    project = tmp_path / "project"
+    soong_files = SoongParser._find_soong_files(
+        tmp_path, "Android.bp", {project, tmp_path / "missing"}
+    )
+
+    assert list(soong_files) == [project]
+    assert soong_files[project] == [
+        path for path in project.rglob("Android.bp") if ".git" not in path.parts
+    ]
+    assert len(soong_files[project]) == 2
+
+
+def test_parse_aosp_parallel(tmp_path):
+    project_map = {}
+    for blueprint in ["dict", "lists", "variables"]:
+        (tmp_path / blueprint).mkdir()
+        (tmp_path / blueprint / "Android.bp").write_text(
+            get_blueprint_path(blueprint).read_text()
+        )
+        project_map[f"platform/{blueprint}"] = blueprint
+
+    soong_parser = SoongParser()
+    soong_parser.parse_aosp(tmp_path, project_map=project_map)
+
+    parallel_parser = SoongParser()
+    parallel_parser.parse_aosp(tmp_path, project_map=project_map, parallel=True)
+
+    assert parallel_parser.sections == soong_parser.sections
+    assert parallel_parser.variables == soong_parser.variables
+    assert len(parallel_parser.sections["linker"]) == 2
+    assert parallel_parser.get_projects_path() == {
+        tmp_path / "dict",
+        tmp_path / "lists",
+        tmp_path / "variables",
+    }
+
+
+def test_manifest_projects():
+    manifest = Manifest(
+        """<manifest>
+            <remote name="aosp" fetch=".." />
+            <project path="build/make" name="platform/build">
+                <copyfile src="core/root.mk" dest="Makefile" />
+            </project>
+            <project name="platform/no_path" />
+            <project path="art" name="platform/art" />
+        </manifest>"""
+    )
+
+    assert manifest.get_projects() == {
+        "platform/build": "build/make",
+        "platform/art": "art",
+    }
+
+    with pytest.raises(bgraph.exc.BGraphManifestException):
+        Manifest("<manifest></manifest>")
+
+
+def test_manifest_decode_base64():
+    content = b'<manifest><project path="art" name="platform/art" /></manifest>'
+    encoded = base64.encodebytes(content)
+
+    chunks = [encoded[index : index + 7] for index in range(0, len(encoded), 7)]
+    assert b"".join(Manifest._decode_base64(chunks)) == content
+
+    with pytest.raises(bgraph.exc.BGraphManifestException):
+        list(Manifest._decode_base64([b"abc"]))
+
+
+def test_parse_string_list():
+    tokens = ['[ "a.c", "-DA=\\"x\\"",\n  "tab\\tx", "a,b", ]']
+
+    assert SoongFileParser.parse_string_list(tokens) == [
+        ["a.c", '-DA="x"', "tab\tx", "a,b"]
+    ]
+    assert SoongFileParser.parse_string_list(["[]"]) == [[]]
+
+
+def test_manifest_projects_cached(tmp_path):
+    manifest_file = tmp_path / "default.xml"
+    manifest_file.write_text(
+        '<manifest><project path="art" name="platform/art" /></manifest>'
+    )
+    cache_dir = tmp_path / "cache"
+
+    projects = Manifest.get_projects_cached(manifest_file, cache_dir)
+    assert projects == {"platform/art": "art"}
+    assert len(list(cache_dir.iterdir())) == 1
+
+    # The cached mapping is used as long as the content does not change
+    cache_file = next(cache_dir.iterdir())
+    with open(cache_file, "wb") as file:
+        pickle.dump({"platform/art": "cached"}, file)
+    assert Manifest.get_projects_cached(manifest_file, cache_dir) == {
+        "platform/art": "cached"
+    }
+
+    manifest_file.write_text(
+        '<manifest><project path="build" name="platform/build" /></manifest>'
+    )
+    assert Manifest.get_projects_cached(manifest_file, cache_dir) == {
+        "platform/build": "build"
+    }
@@ -0,0 +1,116 @@
+import os
+
+import networkx  # type: ignore
+import pytest
+
+import bgraph.cli
+import bgraph.io
+import bgraph.viewer
+from bgraph.types import OutChoice
+
+
+@pytest.fixture(autouse=True)
+def cache_home(tmp_path_factory, monkeypatch):
+    # Keep the listing indexes out of the user cache (and of the listed directories)
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path_factory.mktemp("cache")))
+
+
+def test_fast_list(tmp_path, capsys):
+    (tmp_path / "android-11.bgraph").write_bytes(b"0" * 10)
+
+    bgraph.cli.main(["list", str(tmp_path)])
+    assert "android-11.bgraph" in capsys.readouterr().out
+
+
+def test_fast_query_errors(tmp_path, capsys):
+    graph_path = tmp_path / "android-11.bgraph"
+    graph_path.write_bytes(b"not a graph")
+
+    with pytest.raises(SystemExit) as exc:
+        bgraph.cli.main(["query", str(graph_path), "--target", "a", "--src", "b"])
+    assert exc.value.code == 1
+
+    with pytest.raises(SystemExit) as exc:
+        bgraph.cli.main(["query", str(graph_path)])
+    assert exc.value.code == 1
+    assert "Define one of" in capsys.readouterr().out
+
+    with pytest.raises(SystemExit) as exc:
+        bgraph.cli.main(["query", str(graph_path), "--target", "a"])
+    assert exc.value.code == 1
+    assert "Unable to load the graph" in capsys.readouterr().out
+
+
+def test_query_graph_reused(tmp_path, monkeypatch, capsys):
+    graph_path = tmp_path / "android-11.bgraph"
+    bgraph.io.save_graph(networkx.DiGraph([("a.c", "liba")]), graph_path)
+
+    loads = []
+
+    def load_graph(path):
+        loads.append(path)
+        return bgraph.io.load_graph(path)
+
+    monkeypatch.setattr(bgraph.viewer, "load_graph", load_graph)
+
+    for _ in range(2):
+        bgraph.cli.query(graph_path, "liba", None, None, OutChoice.JSON)
+        assert '"a.c"' in capsys.readouterr().out
+    assert len(loads) == 1
+
+    # A graph loaded by a caller is another graph: modifying it does not leak
+    graph = bgraph.io.load_graph(graph_path)
+    graph.add_edge("b.c", "liba")
+    bgraph.cli.query(graph_path, "liba", None, None, OutChoice.JSON)
+    assert '"b.c"' not in capsys.readouterr().out
+
+    # A modified file is loaded again
+    bgraph.io.save_graph(networkx.DiGraph([("c.c", "liba")]), graph_path)
+    os.utime(graph_path, ns=(0, graph_path.stat().st_mtime_ns + 1))
+    bgraph.cli.query(graph_path, "liba", None, None, OutChoice.JSON)
+    assert '"c.c"' in capsys.readouterr().out
+    assert len(loads) == 2
+
+
+def test_fallback():
+    # Invalid arguments are handed to typer
+    with pytest.raises(bgraph.cli.FallbackException):
+        bgraph.cli.run_fast(["query", "missing.bgraph", "--unknown"])
+
+    with pytest.raises(SystemExit) as exc:
+        bgraph.cli.main(["query", "--help"])
+    assert exc.value.code == 0
+
+
+def test_fallback_abbreviation(tmp_path):
+    graph_path = tmp_path / "android-11.bgraph"
+    graph_path.write_bytes(b"not a graph")
+
+    # Abbreviated options are rejected by typer, so by the fast path too
+    with pytest.raises(bgraph.cli.FallbackException):
+        bgraph.cli.run_fast(["query", str(graph_path), "--tar", "a"])
+
+    with pytest.raises(SystemExit) as exc:
+        bgraph.cli.main(["query", str(graph_path), "--tar", "a"])
+    assert exc.value.code == 2
+
+
+def test_list_index(tmp_path):
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "android-11.bgraph").write_bytes(b"0" * 10)
+
+    assert list(bgraph.cli.list_files(tmp_path, ".bgraph")) == [
+        ("android-11.bgraph", 10)
+    ]
+    assert bgraph.cli.load_index(tmp_path, ".bgraph") == [("android-11.bgraph", 10)]
+
+    # Another extension is not indexed
+    assert bgraph.cli.load_index(tmp_path, ".other") is None
+
+    # Adding a file invalidates the index
+    (tmp_path / "sub" / "android-12.bgraph").write_bytes(b"0" * 20)
+    assert bgraph.cli.load_index(tmp_path, ".bgraph") is None
+    assert sorted(bgraph.cli.list_files(tmp_path, ".bgraph")) == [
+        ("android-11.bgraph", 10),
+        ("android-12.bgraph", 20),
+    ]
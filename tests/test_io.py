@@ -0,0 +1,30 @@
+import pickle
+
+import networkx  # type: ignore
+import pytest
+
+import bgraph.exc
+from bgraph.io import load_graph, save_graph
+
+
+def test_load_graph(tmp_path):
+    graph_path = tmp_path / "android-11.bgraph"
+    with open(graph_path, "wb") as file:
+        pickle.dump(networkx.DiGraph([("a", "b")]), file)
+
+    graph = load_graph(graph_path)
+    assert list(graph.edges) == [("a", "b")]
+
+    # Every load returns a new graph, so a caller can modify it safely
+    graph.add_edge("b", "c")
+    assert list(load_graph(str(graph_path)).edges) == [("a", "b")]
+
+    with pytest.raises(bgraph.exc.BGraphLoadingException):
+        load_graph(tmp_path / "missing.bgraph")
+
+
+def test_save_graph(tmp_path):
+    graph_path = tmp_path / "android-12.bgraph"
+    save_graph(networkx.DiGraph([("a", "b")]), graph_path)
+
+    assert list(load_graph(graph_path).edges) == [("a", "b")]
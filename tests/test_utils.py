@@ -1,4 +1,6 @@
 import pathlib
+import sys
+
 import pytest
 
 import bgraph.utils
@@ -24,6 +26,21 @@ def test_recurse():
 
     assert len(expected_keys) == 0
 
+    # The order is kept, and the depth is not limited
+    mapping = {"a": 1, "b": {"c": 2, "d": {"e": 3}, "f": 4}, "g": 5}
+    assert list(bgraph.utils.recurse(mapping)) == [
+        ("a", 1),
+        ("c", 2),
+        ("e", 3),
+        ("f", 4),
+        ("g", 5),
+    ]
+
+    deep_mapping = {"leaf": 0}
+    for _ in range(2 * sys.getrecursionlimit()):
+        deep_mapping = {"child": deep_mapping}
+    assert list(bgraph.utils.recurse(deep_mapping)) == [("leaf", 0)]
+
 
 def test_clean_mirror_path():
 
@@ -66,3 +83,9 @@ def test_no_except():
         func()
     except ZeroDivisionError:
         pytest.fail("Exception should not have been raised")
+
+
+def test_get_chunksize():
+    assert bgraph.utils.get_chunksize(0) == 1
+    assert bgraph.utils.get_chunksize(1) == 1
+    assert bgraph.utils.get_chunksize(10**6) > 1
@@ -1,5 +1,23 @@
+import gc
+import sys
+from pathlib import Path
+
+import networkx  # type: ignore
+import pytest
+
+import bgraph.exc
 import bgraph.parsers
-from bgraph.viewer.viewer import get_node_type
+import bgraph.viewer.viewer
+from bgraph.types import QueryType
+from bgraph.viewer.formatter import _get_suffix, format_dot, format_json
+from bgraph.viewer.viewer import (
+    find_dependency,
+    find_sources,
+    get_graph_node_type,
+    get_graph_srcs,
+    get_node_type,
+    match_node,
+)
 
 
 def test_get_node_type():
@@ -24,3 +42,136 @@ def test_get_node_type():
 
     # All of them are returned
     assert get_node_type(node_data, all_types=True) == ["test", "other_test"]
+
+    # Nodes without (valid) sections are sources
+    assert get_node_type({"data": None}) == "source"
+    assert get_node_type({"data": []}, all_types=True) == ["source"]
+    assert get_node_type({"data": [{"name": "a"}]}) == "source"
+
+
+def test_get_graph_node_type():
+    graph = networkx.DiGraph([("a.c", "liba")])
+    graph.nodes["liba"]["data"] = [
+        {bgraph.parsers.SoongParser.SECTION_TYPE: "cc_defaults"},
+        {bgraph.parsers.SoongParser.SECTION_TYPE: "cc_library"},
+    ]
+
+    assert get_graph_node_type(graph, "a.c") == "source"
+    assert get_graph_node_type(graph, "liba") == get_node_type(graph.nodes["liba"])
+    assert get_graph_node_type(graph, "liba", all_types=True) == [
+        "cc_defaults",
+        "cc_library",
+    ]
+
+
+def test_get_graph_srcs():
+    graph = networkx.DiGraph([("a.c", "liba")])
+    graph.nodes["liba"]["data"] = [
+        {bgraph.parsers.SoongParser.SECTION_TYPE: "cc_library"}
+    ]
+    graph_srcs = get_graph_srcs(graph)
+
+    assert graph_srcs == ["a.c"]
+    assert get_graph_srcs(graph) is graph_srcs
+
+    # The cache does not keep the graph alive
+    graph_id = id(graph)
+    del graph
+    gc.collect()
+    assert graph_id not in bgraph.viewer.viewer._GRAPH_CACHES
+
+
+def test_match_node():
+    graph_srcs = ["lib/a.c", "a.c", "b.c"]
+
+    assert match_node(graph_srcs, "b.") == "b.c"
+    with pytest.raises(bgraph.exc.BGraphTooManyNodes):
+        match_node(graph_srcs, "a.c")
+    with pytest.raises(bgraph.exc.BGraphNodeNotFound):
+        match_node(graph_srcs, "d.c")
+
+    # An exact match is preferred
+    assert match_node(graph_srcs, "a.c", frozenset(graph_srcs)) == "a.c"
+
+    # Same results when searching the blob
+    blob = "\n{}\n".format("\n".join(graph_srcs))
+    assert match_node(graph_srcs, "b.", graph_srcs_blob=blob) == "b.c"
+    assert match_node(graph_srcs, "lib/", graph_srcs_blob=blob) == "lib/a.c"
+    with pytest.raises(bgraph.exc.BGraphTooManyNodes):
+        match_node(graph_srcs, "a.c", graph_srcs_blob=blob)
+    with pytest.raises(bgraph.exc.BGraphNodeNotFound):
+        match_node(graph_srcs, "d.c", graph_srcs_blob=blob)
+
+
+def test_find_sources():
+    graph = networkx.DiGraph(
+        [("a.c", "liba"), ("b.c", "libb"), ("libb", "liba"), ("liba", "bin")]
+    )
+
+    assert sorted(find_sources(graph, "bin")) == ["a.c", "b.c"]
+    assert find_sources(graph, "libb") == ["b.c"]
+    assert find_sources(graph, "missing") == []
+
+
+def test_format_dot(capsys):
+    graph = networkx.DiGraph()
+    graph.add_node(
+        "liba", data=[{bgraph.parsers.SoongParser.SECTION_TYPE: "cc_library"}]
+    )
+    graph.add_edge("a.c", "liba", type="src")
+
+    format_dot(graph, ["a.c", "liba"], QueryType.DEPENDENCY, "liba")
+
+    output = capsys.readouterr().out
+    assert "data" not in output
+    assert '"a.c" -> liba' in output
+
+
+@pytest.mark.parametrize("use_orjson", [False, True])
+def test_format_json(capsys, monkeypatch, use_orjson):
+    if use_orjson:
+        pytest.importorskip("orjson")
+    else:
+        # Without orjson, json is used instead
+        monkeypatch.setitem(sys.modules, "orjson", None)
+
+    graph = networkx.DiGraph([("caf\u00e9.c", "liba")])
+    format_json(graph, ["caf\u00e9.c"], QueryType.TARGET, "liba")
+
+    # Indented with 2 spaces, non-ASCII characters are not escaped
+    assert capsys.readouterr().out == (
+        "{\n"
+        '  "_meta": {\n'
+        '    "query": "target",\n'
+        '    "desc": "Search sources for a target",\n'
+        '    "query_value": "liba"\n'
+        "  },\n"
+        '  "result": {\n'
+        '    "sources": [\n'
+        '      "caf\u00e9.c"\n'
+        "    ]\n"
+        "  }\n"
+        "}\n"
+    )
+
+
+def test_find_dependency_cached():
+    graph = networkx.DiGraph([("a.c", "liba"), ("liba", "bin")])
+
+    dependencies = find_dependency(graph, "liba")
+    assert sorted(dependencies) == ["a.c", "bin", "liba"]
+
+    # The cached results are not shared with the callers
+    dependencies.clear()
+    assert sorted(find_dependency(graph, "liba")) == ["a.c", "bin", "liba"]
+
+    sources = find_sources(graph, "bin")
+    sources.append("b.c")
+    assert find_sources(graph, "bin") == ["a.c"]
+
+
+@pytest.mark.parametrize(
+    "file_name", ["a.c", "lib/x.tar.gz", "file.", ".bashrc", "a.b/c", "..", ""]
+)
+def test_get_suffix(file_name):
+    assert _get_suffix(file_name) == Path(file_name).suffix